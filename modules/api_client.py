@@ -1,8 +1,16 @@
 import streamlit as st
-import requests
 import os
+import time
 from dotenv import load_dotenv
+from openai import APIConnectionError, APIStatusError
+from modules.context_builder import context_builder, estimate_tokens
 from modules.data_loader import data_loader
+from modules.llm_runtime import llm_runtime, ProviderConfig
+from modules.metrics import metrics
+from modules.prompt_builder import prompt_builder
+from modules.rate_limiter import RateLimitTimeout
+from modules.resilience import CircuitOpenError
+from modules.response_cache import ResponseCacheFactory, make_cache_key
 from modules.session_manager import session_manager
 
 # 加载环境变量
@@ -14,14 +22,44 @@ class APIClient:
     def __init__(self):
         self.data_loader = data_loader
         self.api_key = os.getenv('DEEPSEEK_API_KEY')
+        # 聊天响应缓存（按配置创建）
+        self._response_cache = ResponseCacheFactory("chat")
     
-    def call_deepseek_api(self, messages):
+    def _provider_config(self, api_config):
+        """
+        根据聊天配置构建 DeepSeek 服务商连接配置
+        
+        Args:
+            api_config (dict): chat_config.json 中的 chat_interface 段
+        
+        Returns:
+            ProviderConfig: 连接配置
+        """
+        # 环境变量 DEEPSEEK_API_URL 优先（例如指向本地模拟服务）
+        model_url = os.getenv("DEEPSEEK_API_URL") or api_config.get("model_url", "https://api.deepseek.com/v1/chat/completions")
+        # OpenAI 兼容客户端只需要基础地址
+        base_url = model_url[:-len("/chat/completions")] if model_url.endswith("/chat/completions") else model_url
+        return ProviderConfig.from_pool_config(self.api_key, base_url, api_config.get("connection_pool", {}),
+                                               api_config.get("resilience", {}),
+                                               api_config.get("rate_limit", {}))
+    
+    def _request_params(self, api_config, messages):
+        """构建请求参数"""
+        return {
+            "model": api_config.get("model_name", "deepseek-chat"),
+            "messages": messages,
+            "temperature": api_config.get("interface_params", {}).get("temperature", 0.7),
+            "max_tokens": api_config.get("interface_params", {}).get("max_tokens", 4096)
+        }
+    
+    def call_deepseek_api(self, messages, on_wait=None):
         """
         调用 DeepSeek API 接口
-        发送请求到 DeepSeek API 并获取响应结果
+        通过共享的异步运行时发送请求并等待结果
         
         Args:
             messages (list): 消息列表
+            on_wait (callable): 限流排队时以 (排队位置, 已等待秒数) 调用
         
         Returns:
             str: AI 返回的响应文本，失败时返回 None
@@ -33,45 +71,47 @@ class APIClient:
         chat_config = self.data_loader.get_chat_config()
         api_config = chat_config.get("chat_interface", {})
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        # 构建请求数据
-        data = {
-            "model": api_config.get("model_name", "deepseek-chat"),
-            "messages": messages,
-            "temperature": api_config.get("interface_params", {}).get("temperature", 0.7),
-            "max_tokens": api_config.get("interface_params", {}).get("max_tokens", 4096)
-        }
-        
         try:
-            # 发送 POST 请求到 DeepSeek API
-            response = requests.post(api_config.get("model_url", "https://api.deepseek.com/v1/chat/completions"), 
-                                   headers=headers, json=data, timeout=30)
-            response.raise_for_status()  # 检查 HTTP 状态码
-            
-            # 解析响应数据
-            result = response.json()
-            return result['choices'][0]['message']['content']
-            
-        except requests.exceptions.RequestException as e:
-            # 处理网络请求错误
-            st.error(f"网络请求失败: {str(e)}")
+            completion = llm_runtime.complete("deepseek", self._provider_config(api_config), on_wait=on_wait,
+                                              **self._request_params(api_config, messages))
+            return completion.choices[0].message.content
+        except Exception as e:
+            self._report_api_error(e)
             return None
-        except KeyError as e:
+    
+    def _report_api_error(self, error):
+        """按错误类型在页面上显示 API 调用失败信息"""
+        if isinstance(error, CircuitOpenError):
+            # 熔断期间直接提示服务不可用，不再等待超时
+            messages = self.data_loader.get_ui_config().get("messages", {})
+            st.error(messages.get("api_error", "AI服务暂时不可用") + "，请稍后再试")
+        elif isinstance(error, RateLimitTimeout):
+            # 排队超时
+            st.error(f"当前使用人数较多，请稍后再试（{str(error)}）")
+        elif isinstance(error, (APIConnectionError, APIStatusError)):
+            # 处理网络请求错误
+            st.error(f"网络请求失败: {str(error)}")
+        elif isinstance(error, (KeyError, IndexError, AttributeError)):
             # 处理响应数据解析错误
-            st.error(f"API 响应格式错误: {str(e)}")
-            return None
-        except Exception as e:
+            st.error(f"API 响应格式错误: {str(error)}")
+        else:
             # 处理其他未知错误
-            st.error(f"API 调用失败: {str(e)}")
-            return None
+            st.error(f"API 调用失败: {str(error)}")
+    
+    def _iter_stream_content(self, api_config, messages, on_wait=None):
+        """流式请求并逐段返回文本，错误直接抛出"""
+        # 读取超时作用于相邻两个数据块之间，长回答不会因总耗时超时而丢失
+        for chunk in llm_runtime.stream("deepseek", self._provider_config(api_config), on_wait=on_wait,
+                                        **self._request_params(api_config, messages)):
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                yield content
     
-    def get_ai_response(self, user_message, context=None, stage_id=None):
+    def build_messages(self, user_message, context=None, stage_id=None):
         """
-        获取 AI 对用户消息的回应
+        构建发送给模型的消息列表
         
         Args:
             user_message (str): 用户输入的消息
@@ -79,38 +119,82 @@ class APIClient:
             stage_id (int): 阶段ID，用于获取特定阶段的聊天历史
         
         Returns:
-            str: AI 返回的响应文本
+            list: 消息列表
         """
         chat_config = self.data_loader.get_chat_config()
-        system_prompt = chat_config.get("chat_interface", {}).get("interface_params", {}).get("system_prompt", "")
+        api_config = chat_config.get("chat_interface", {})
+        system_prompt = api_config.get("interface_params", {}).get("system_prompt", "")
         
-        # 构建上下文信息
+        # 静态系统提示在前、阶段/课题上下文在后，保证请求前缀稳定以命中服务端前缀缓存
+        fixed_tokens = estimate_tokens(system_prompt)
         if context:
-            stage_name = context.get("stage_name", "")
-            topic_name = context.get("topic_name", "")
-            system_prompt += f"\n\n当前阶段：{stage_name}\n当前课题：{topic_name}"
-        
-        messages = [
-            {
-                "role": "system",
-                "content": system_prompt
-            }
-        ]
-        
-        # 添加聊天历史（使用阶段特定的历史或全局历史）
+            fixed_tokens += estimate_tokens(prompt_builder.context_message(
+                context.get("stage_name", ""), context.get("topic_name", ""))["content"])
+        
+        # 按 token 预算选取聊天历史（使用阶段特定的历史或全局历史），更早的消息折叠为摘要
         chat_history = session_manager.get_chat_history(stage_id)
-        for msg in chat_history[-10:]:  # 只保留最近10条消息
-            messages.append(msg)
+        summary, recent_history = context_builder.build(
+            chat_history, user_message, fixed_tokens,
+            stage_id=stage_id, config=api_config.get("context", {})
+        )
         
-        # 添加当前用户消息
-        messages.append({
-            "role": "user",
-            "content": user_message
-        })
+        return prompt_builder.chat_messages(system_prompt, user_message, recent_history,
+                                            summary=summary, context=context)
+    
+    def get_ai_response(self, user_message, context=None, stage_id=None, on_token=None, on_wait=None):
+        """
+        获取 AI 对用户消息的回应
         
-        return self.call_deepseek_api(messages)
+        Args:
+            user_message (str): 用户输入的消息
+            context (dict): 上下文信息（阶段、课题等）
+            stage_id (int): 阶段ID，用于获取特定阶段的聊天历史
+            on_token (callable): 流式模式下每收到新内容时以当前完整文本调用
+            on_wait (callable): 限流排队时以 (排队位置, 已等待秒数) 调用
+        
+        Returns:
+            str: AI 返回的响应文本，失败或流式输出中断时返回 None
+        """
+        started = time.perf_counter()
+        messages = self.build_messages(user_message, context, stage_id)
+        
+        chat_config = self.data_loader.get_chat_config()
+        api_config = chat_config.get("chat_interface", {})
+        
+        # 相同请求（模型参数、系统提示及上下文、消息列表）直接返回缓存结果
+        cache = self._response_cache.get(api_config.get("response_cache"))
+        cache_key = None
+        if cache is not None:
+            params = self._request_params(api_config, messages)
+            cache_key = make_cache_key(**params)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                if on_token is not None:
+                    on_token(cached)
+                metrics.observe("chat_response_seconds", time.perf_counter() - started, source="cache")
+                return cached
+        
+        streaming = api_config.get("interface_params", {}).get("stream", False)
+        if on_token is None or not streaming:
+            response_text = self.call_deepseek_api(messages, on_wait=on_wait)
+        else:
+            response_text = ""
+            try:
+                for content in self._iter_stream_content(api_config, messages, on_wait=on_wait):
+                    response_text += content
+                    on_token(response_text)
+            except Exception as e:
+                self._report_api_error(e)
+                # 流中断时的部分回答不是完整回复，既不返回也不写入缓存
+                return None
+        
+        metrics.observe("chat_response_seconds", time.perf_counter() - started,
+                        source="stream" if on_token is not None and streaming else "complete")
+        if cache is not None and response_text:
+            cache.put(cache_key, response_text)
+        return response_text
     
-    def send_message(self, user_message, stage_id=None, topic_id=None):
+    def send_message(self, user_message, stage_id=None, topic_id=None, on_token=None, on_wait=None):
         """
         发送消息到 AI 并处理响应
         
@@ -118,6 +202,8 @@ class APIClient:
             user_message (str): 用户消息
             stage_id (int): 阶段ID
             topic_id (int): 课题ID
+            on_token (callable): 流式渲染回调，参数为当前已生成的完整文本
+            on_wait (callable): 限流排队回调，参数为 (排队位置, 已等待秒数)
         
         Returns:
             tuple: (success, response_message)
@@ -134,15 +220,15 @@ class APIClient:
         selected_topic = session_manager.get_selected_topic()
         
         if selected_stage:
-            context["stage_name"] = selected_stage.get("name", "")
+            context["stage_name"] = selected_stage.name
         if selected_topic:
-            context["topic_name"] = selected_topic.get("name", "")
+            context["topic_name"] = selected_topic.name
         
         # 添加用户消息到历史
         session_manager.add_chat_message("user", user_message, stage_id)
         
         # 获取AI响应
-        ai_response = self.get_ai_response(user_message, context, stage_id)
+        ai_response = self.get_ai_response(user_message, context, stage_id, on_token=on_token, on_wait=on_wait)
         
         if ai_response:
             # 添加AI响应到历史
@@ -159,6 +245,7 @@ class APIClient:
             stage_id (int): 阶段ID，如果提供则清空特定阶段的聊天历史
         """
         session_manager.set_chat_history([], stage_id)
+        session_manager.set_chat_summary(None, stage_id)
 
 # 创建全局 API 客户端实例
 api_client = APIClient()
\ No newline at end of file
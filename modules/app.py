@@ -1,5 +1,8 @@
+import hmac
+import os
 import streamlit as st
 from modules.config import app_config, PAGE_STAGE_SELECTION, PAGE_MAIN_INTERFACE
+from modules.metrics import metrics
 from modules.session_manager import session_manager
 from modules.ui_components import ui_components
 from modules.stage_selection import StageSelection
@@ -19,6 +22,17 @@ class ReSocialApp:
         app_config.configure_page()
         app_config.apply_custom_styles()
         session_manager.init_session_state()
+        # 设置了 METRICS_PORT 时启动指标服务（每个进程只启动一次）
+        metrics.start_server_from_env()
+    
+    def is_admin_request(self):
+        """
+        判断当前请求是否可以查看运行指标
+        需要设置环境变量 ADMIN_TOKEN，并在地址中携带 ?admin=<ADMIN_TOKEN>
+        """
+        token = os.getenv("ADMIN_TOKEN")
+        provided = st.query_params.get("admin")
+        return bool(token) and provided is not None and hmac.compare_digest(provided, token)
     
     def render_sidebar(self):
         """
@@ -62,11 +76,18 @@ class ReSocialApp:
         # 初始化应用
         self.initialize_app()
         
+        # 管理员指标页面
+        if self.is_admin_request():
+            with metrics.timer("page_render_seconds", page="admin"):
+                ui_components.show_metrics_dashboard()
+            return
+        
         # 渲染侧边栏
         self.render_sidebar()
         
         # 路由页面
-        self.route_pages()
+        with metrics.timer("page_render_seconds", page=session_manager.get_current_page()):
+            self.route_pages()
 
 def main():
     """
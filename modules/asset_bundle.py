@@ -0,0 +1,148 @@
+import argparse
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+# 二进制包格式：文件头 + marshal 编码的目录 + 各配置文件的 marshal 数据块
+BUNDLE_MAGIC = b"PBAB"
+BUNDLE_VERSION = 1
+_PREAMBLE = struct.Struct(">4sHI")  # magic, 格式版本, 目录长度
+
+DEFAULT_BUNDLE_NAME = "assets.bundle"
+
+
+def _runtime_tag() -> Tuple[int, int, int]:
+    """marshal 格式与解释器版本相关，记录构建时的运行环境"""
+    return sys.version_info[0], sys.version_info[1], marshal.version
+
+
+def build_bundle(assets_path: str = "assets", output_path: Optional[str] = None) -> str:
+    """
+    将配置目录下的所有 JSON 文件编译为一个二进制包
+
+    Args:
+        assets_path (str): 配置文件目录
+        output_path (str): 输出路径，默认为 assets_path/assets.bundle
+
+    Returns:
+        str: 生成的二进制包路径
+    """
+    output_path = output_path or os.path.join(assets_path, DEFAULT_BUNDLE_NAME)
+
+    payloads = []
+    files = {}
+    offset = 0
+    for filename in sorted(os.listdir(assets_path)):
+        if not filename.endswith(".json"):
+            continue
+        filepath = os.path.join(assets_path, filename)
+        with open(filepath, 'rb') as f:
+            raw = f.read()
+        stat = os.stat(filepath)
+        payload = marshal.dumps(json.loads(raw.decode('utf-8')))
+        files[filename] = (offset, len(payload), stat.st_mtime_ns, stat.st_size,
+                           hashlib.sha256(raw).hexdigest())
+        payloads.append(payload)
+        offset += len(payload)
+
+    directory = marshal.dumps({"runtime": _runtime_tag(), "files": files})
+
+    # 先写临时文件再替换，避免运行中的进程读到写了一半的包
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(directory)))
+        f.write(directory)
+        for payload in payloads:
+            f.write(payload)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class AssetBundle:
+    """预编译配置包读取器：内存映射整个文件，按需解码单个配置"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mmap = None
+        self._files = None
+        self._data_start = 0
+        self._lock = threading.Lock()
+
+    def _open(self) -> Dict[str, tuple]:
+        """首次访问时映射文件并读取目录；包缺失、损坏或版本不符时视为空包"""
+        if self._files is not None:
+            return self._files
+
+        with self._lock:
+            if self._files is not None:
+                return self._files
+
+            files = {}
+            try:
+                with open(self.path, 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, version, directory_length = _PREAMBLE.unpack_from(mapped, 0)
+                directory = marshal.loads(mapped[_PREAMBLE.size:_PREAMBLE.size + directory_length])
+                if magic == BUNDLE_MAGIC and version == BUNDLE_VERSION \
+                        and tuple(directory.get("runtime", ())) == _runtime_tag():
+                    self._mmap = mapped
+                    self._data_start = _PREAMBLE.size + directory_length
+                    files = directory.get("files", {})
+                else:
+                    mapped.close()
+                    print(f"配置包版本不匹配，改为读取JSON: {self.path}")
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, EOFError, TypeError, struct.error):
+                print(f"配置包读取失败，改为读取JSON: {self.path}")
+
+            self._files = files
+            return files
+
+    def load(self, filename: str, filepath: str, stat: os.stat_result) -> Optional[Tuple[Any, str]]:
+        """
+        从包中读取配置数据
+
+        Args:
+            filename (str): 配置文件名
+            filepath (str): 源 JSON 文件路径，用于校验包是否过期
+            stat (os.stat_result): 源文件当前状态
+
+        Returns:
+            tuple: (data, digest)，包中没有该文件或已过期时返回 None
+        """
+        record = self._open().get(filename)
+        if record is None:
+            return None
+
+        offset, length, mtime_ns, size, digest = record
+        if size != stat.st_size:
+            return None
+        if mtime_ns != stat.st_mtime_ns:
+            # 修改时间不同（例如重新检出代码），按内容哈希确认
+            with open(filepath, 'rb') as f:
+                if hashlib.sha256(f.read()).hexdigest() != digest:
+                    return None
+
+        start = self._data_start + offset
+        return marshal.loads(self._mmap[start:start + length]), digest
+
+
+def main():
+    """命令行入口：python -m modules.asset_bundle [assets_path] [-o output]"""
+    parser = argparse.ArgumentParser(description="将配置文件编译为二进制包")
+    parser.add_argument("assets_path", nargs="?", default="assets", help="配置文件目录")
+    parser.add_argument("-o", "--output", default=None, help="输出路径")
+    args = parser.parse_args()
+
+    output_path = build_bundle(args.assets_path, args.output)
+    print(f"配置包已生成: {output_path}")
+
+if __name__ == "__main__":
+    main()
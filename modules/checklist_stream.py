@@ -0,0 +1,221 @@
+import codecs
+import collections.abc
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from modules.models import Checklist
+
+# 流式模式下每次读取的字节数
+_CHUNK_SIZE = 1024 * 1024
+_WHITESPACE = re.compile(r"\s*")
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def _iter_array_elements(f, key: str, hasher) -> Iterator[Tuple[int, int, Any]]:
+    """
+    逐个解析顶层对象中 key 对应数组的元素，内存占用只与单个元素大小相关
+
+    Args:
+        f: 以二进制模式打开的文件
+        key (str): 顶层数组的键名
+        hasher: 用于计算整个文件内容哈希的 hashlib 对象
+
+    Yields:
+        tuple: (元素起始字节偏移, 元素字节长度, 解析后的元素)
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ""
+    pos = 0          # 当前解析位置（字符下标）
+    pos_byte = 0     # 当前解析位置在文件中的字节偏移
+    eof = False
+
+    def fill() -> bool:
+        # 丢弃已解析部分后追加新数据
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = f.read(_CHUNK_SIZE)
+        hasher.update(chunk)
+        eof = not chunk
+        buffer = buffer[pos:] + text_decoder.decode(chunk, final=eof)
+        pos = 0
+        return True
+
+    def advance(end: int):
+        nonlocal pos, pos_byte
+        pos_byte += len(buffer[pos:end].encode('utf-8'))
+        pos = end
+
+    def skip(pattern) -> str:
+        # 跳过匹配的字符，返回下一个字符（文件结束时返回空串）
+        while True:
+            advance(pattern.match(buffer, pos).end())
+            if pos < len(buffer) or not fill():
+                return buffer[pos:pos + 1]
+
+    def expect(chars: str) -> str:
+        # 跳过空白后读取一个指定的结构字符
+        char = skip(_WHITESPACE)
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"期望 {' 或 '.join(repr(c) for c in chars)}", buffer, pos)
+        advance(pos + 1)
+        return char
+
+    def decode() -> Tuple[Any, int]:
+        # 解析当前位置的一个完整 JSON 值；值恰好止于缓冲区末尾时（可能是被截断的数字）继续读取
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                if end < len(buffer) or eof:
+                    return value, end
+            except json.JSONDecodeError:
+                # 缓冲区中的值不完整，继续读取
+                if eof:
+                    raise
+            fill()
+
+    # 逐个读取顶层对象的键，跳过其他键的值，直到找到 "key": [；顶层对象中没有该键时不产生元素
+    expect("{")
+    found = skip(_WHITESPACE) != "}"
+    while found:
+        name, end = decode()
+        if not isinstance(name, str):
+            raise json.JSONDecodeError("期望键名", buffer, pos)
+        advance(end)
+        expect(":")
+        if name == key:
+            expect("[")
+            break
+        skip(_WHITESPACE)
+        advance(decode()[1])
+        found = expect(",}") == ","
+        skip(_WHITESPACE)
+
+    while found:
+        # 跳过元素之间的空白和逗号
+        if skip(_SEPARATORS) in ("", "]"):
+            break
+
+        element, end = decode()
+        start = pos_byte
+        advance(end)
+        yield start, pos_byte - start, element
+
+    # 读完剩余内容以得到完整文件的哈希
+    while fill():
+        pass
+
+
+class StreamingChecklistIndex:
+    """
+    大型清单文件的流式索引
+    首次扫描只记录 课题→清单字节偏移 以及项目反向映射和权重，
+    按课题读取时只解码该课题的清单，并用有界 LRU 缓存最近访问的课题切片
+    """
+
+    def __init__(self, filepath: str, cache_size: int = 64):
+        self.filepath = filepath
+        self.cache_size = cache_size
+        self.digest = ""
+        self._offsets_by_topic: Dict[int, Tuple[Tuple[int, int], ...]] = {}
+        self._topic_by_checklist: Dict[int, int] = {}
+        self._item_location: Dict[Tuple[int, int], Tuple[int, int, Optional[int]]] = {}
+        self._item_weight: Dict[Tuple[int, int], float] = {}
+        self._slices: "OrderedDict[int, Tuple[Checklist, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def scan(self) -> str:
+        """
+        扫描整个文件并建立偏移索引
+
+        Returns:
+            str: 文件内容的 sha256
+        """
+        hasher = hashlib.sha256()
+        offsets: Dict[int, List[Tuple[int, int]]] = {}
+        with open(self.filepath, 'rb') as f:
+            for offset, length, raw in _iter_array_elements(f, "checklists", hasher):
+                try:
+                    checklist = Checklist.from_dict(raw)
+                except (ValueError, TypeError, AttributeError) as e:
+                    print(f"数据校验失败: {self.filepath}: {e}")
+                    continue
+                offsets.setdefault(checklist.topic_id, []).append((offset, length))
+                self._topic_by_checklist[checklist.id] = checklist.topic_id
+                location = (checklist.id, checklist.topic_id, checklist.stage_id)
+                for item in checklist.items:
+                    self._item_location[(checklist.id, item.id)] = location
+                    self._item_weight[(checklist.id, item.id)] = item.weight
+
+        self._offsets_by_topic = {topic_id: tuple(spans) for topic_id, spans in offsets.items()}
+        self.digest = hasher.hexdigest()
+        return self.digest
+
+    def load_topic(self, topic_id: int) -> Tuple[Checklist, ...]:
+        """读取指定课题的清单，优先使用 LRU 缓存"""
+        with self._lock:
+            cached = self._slices.get(topic_id)
+            if cached is not None:
+                self._slices.move_to_end(topic_id)
+                return cached
+
+        spans = self._offsets_by_topic.get(topic_id)
+        if spans is None:
+            raise KeyError(topic_id)
+
+        checklists = []
+        with open(self.filepath, 'rb') as f:
+            for offset, length in spans:
+                f.seek(offset)
+                checklists.append(Checklist.from_dict(json.loads(f.read(length).decode('utf-8'))))
+        checklists = tuple(checklists)
+
+        with self._lock:
+            self._slices[topic_id] = checklists
+            self._slices.move_to_end(topic_id)
+            while len(self._slices) > self.cache_size:
+                self._slices.popitem(last=False)
+        return checklists
+
+    def load_checklist(self, checklist_id: int) -> Checklist:
+        """读取指定清单（通过其所属课题的切片）"""
+        topic_id = self._topic_by_checklist[checklist_id]
+        for checklist in self.load_topic(topic_id):
+            if checklist.id == checklist_id:
+                return checklist
+        raise KeyError(checklist_id)
+
+    def as_index(self) -> Mapping[str, Any]:
+        """生成与内存模式结构相同的只读索引，供 DataLoader 直接使用"""
+        return MappingProxyType({
+            "all": (),
+            "by_id": _LazyMapping(self._topic_by_checklist, self.load_checklist),
+            "by_topic": _LazyMapping(self._offsets_by_topic, self.load_topic),
+            "item_location": MappingProxyType(self._item_location),
+            "item_weight": MappingProxyType(self._item_weight),
+        })
+
+
+class _LazyMapping(collections.abc.Mapping):
+    """键集合已知、值在访问时才加载的只读映射"""
+
+    def __init__(self, keys: Mapping, loader):
+        self._keys = keys
+        self._loader = loader
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return self._loader(key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
@@ -0,0 +1,195 @@
+import hashlib
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from modules.models import settings_from_config
+from modules.session_manager import session_manager
+
+# 中日韩文字及全角标点
+_CJK = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+# 句子结束符，用于截取摘要
+_SENTENCE_END = re.compile(r"[。！？!?\n]|\.\s")
+# 每条消息在对话格式中的固定开销
+_MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    本地估算文本的 token 数（不调用分词器）
+    按 DeepSeek 文档的经验值：1 个中文字符约 0.6 个 token，1 个英文字符约 0.3 个 token
+
+    Args:
+        text (str): 文本
+
+    Returns:
+        int: 估算的 token 数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return int(cjk * 0.6 + (len(text) - cjk) * 0.3) + 1
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    """估算单条消息的 token 数"""
+    return estimate_tokens(str(message.get("content", ""))) + _MESSAGE_OVERHEAD
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """把文本截断到大约 max_tokens 个 token"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 二分查找满足预算的最长前缀
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + "…（已截断）"
+
+
+class ContextSettings(NamedTuple):
+    """对话上下文的 token 预算"""
+    max_context_tokens: int = 6000        # 系统提示、摘要、历史和当前消息的总预算
+    max_message_tokens: int = 1500        # 单条历史消息的上限，超出部分截断
+    summary_tokens: int = 800             # 早期对话摘要的上限
+    summary_chars_per_message: int = 120  # 每条被折叠的消息在摘要中保留的字符数
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "ContextSettings":
+        """根据配置文件中的 context 段构建"""
+        return settings_from_config(cls, config)
+
+
+class ContextBuilder:
+    """
+    按 token 预算组装聊天上下文
+    从最新的消息开始向前装入历史，放不下的早期消息折叠进该阶段的滚动摘要；
+    摘要缓存在会话状态中，每次只追加新折叠的消息，不重复处理整段历史
+    """
+
+    def _fingerprint(self, message: Dict[str, Any]) -> str:
+        """消息指纹，用于判断缓存的摘要是否仍对应当前历史"""
+        return hashlib.sha1(f"{message.get('role')}:{message.get('content')}".encode("utf-8")).hexdigest()
+
+    def _condense(self, message: Dict[str, Any], max_chars: int) -> str:
+        """把一条消息压缩为一行摘要：角色 + 开头的句子"""
+        text = " ".join(str(message.get("content", "")).split())
+        match = _SENTENCE_END.search(text, min(len(text), 20))
+        if match and match.end() <= max_chars:
+            text = text[:match.end()].strip()
+        elif len(text) > max_chars:
+            text = text[:max_chars] + "…"
+        speaker = "学生" if message.get("role") == "user" else "导师助手"
+        return f"- {speaker}：{text}"
+
+    def _update_summary(self, history: List[Dict[str, Any]], fold_until: int,
+                        stage_id: Optional[int], settings: ContextSettings) -> Tuple[str, int]:
+        """
+        让摘要至少覆盖 history[:fold_until]
+
+        Returns:
+            tuple: (摘要文本, 摘要实际覆盖的消息数)
+        """
+        cached = session_manager.get_chat_summary(stage_id) or {}
+        covered = cached.get("covered", 0)
+        lines = list(cached.get("lines", ()))
+
+        # 历史被清空或替换时从头重建
+        if covered and (covered > len(history)
+                        or self._fingerprint(history[covered - 1]) != cached.get("anchor")):
+            covered, lines = 0, []
+
+        # 摘要已覆盖更多消息时沿用，保持摘要和窗口起点稳定
+        if covered >= fold_until:
+            return "\n".join(lines), covered
+
+        for message in history[covered:fold_until]:
+            lines.append(self._condense(message, settings.summary_chars_per_message))
+
+        # 超出摘要预算时保留第一条（通常是最初的问题），从其后依次丢弃
+        costs = [estimate_tokens(line) for line in lines]
+        total = sum(costs)
+        drop = 1
+        while drop < len(lines) and total > settings.summary_tokens:
+            total -= costs[drop]
+            drop += 1
+        lines = lines[:1] + lines[drop:]
+
+        session_manager.set_chat_summary({
+            "covered": fold_until,
+            "anchor": self._fingerprint(history[fold_until - 1]),
+            "lines": lines,
+        }, stage_id)
+        return "\n".join(lines), fold_until
+
+    def _fit(self, message: Dict[str, Any], settings: ContextSettings) -> Dict[str, Any]:
+        """截断超长的单条历史消息"""
+        content = str(message.get("content", ""))
+        if estimate_tokens(content) <= settings.max_message_tokens:
+            return message
+        return {"role": message.get("role"),
+                "content": truncate_to_tokens(content, settings.max_message_tokens)}
+
+    def build(self, history: List[Dict[str, Any]], user_message: str, fixed_tokens: int,
+              stage_id: Optional[int] = None,
+              config: Optional[Dict[str, Any]] = None) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        在预算内选取历史消息并生成早期对话摘要
+        只处理预算范围内的最新消息，耗时与会话总长度无关
+
+        Args:
+            history (list): 该阶段的完整聊天历史
+            user_message (str): 当前用户消息
+            fixed_tokens (int): 系统提示等固定部分的 token 数
+            stage_id (int): 阶段ID，摘要按阶段缓存
+            config (dict): chat_config.json 中的 context 段
+
+        Returns:
+            tuple: (摘要文本, 按时间顺序排列的历史消息)
+        """
+        settings = ContextSettings.from_config(config)
+
+        # send_message 在请求前已把当前消息写入历史，这里不再重复发送
+        if history and history[-1].get("role") == "user" and history[-1].get("content") == user_message:
+            history = history[:-1]
+
+        budget = (settings.max_context_tokens - fixed_tokens
+                  - estimate_tokens(user_message) - _MESSAGE_OVERHEAD)
+        # 需要摘要时为其预留空间
+        history_budget = budget - settings.summary_tokens
+
+        # 从最新的消息开始向前装入，超出总预算即停止
+        window: List[Dict[str, Any]] = []
+        used = 0
+        start = len(history)      # 在 history_budget 内能装入的最早位置
+        index = len(history)
+        while index > 0:
+            message = self._fit(history[index - 1], settings)
+            used += message_tokens(message)
+            if used > budget:
+                break
+            index -= 1
+            window.append(message)
+            if used <= history_budget:
+                start = index
+
+        window.reverse()
+        # 全部历史都放得下时不需要摘要
+        if index == 0:
+            return "", window
+
+        summary, start = self._update_summary(history, self._align(history, start), stage_id, settings)
+        # window 对应 history[index:]
+        return summary, window[start - index:]
+
+    def _align(self, history: List[Dict[str, Any]], start: int) -> int:
+        """让窗口从用户消息开始，避免以孤立的助手回答开头"""
+        while start < len(history) and history[start].get("role") != "user":
+            start += 1
+        return start
+
+# 创建全局上下文构建器实例
+context_builder = ContextBuilder()
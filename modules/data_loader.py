@@ -1,68 +1,356 @@
+import hashlib
 import json
 import os
-from typing import Dict, List, Any
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Any, Mapping, Optional, Tuple, NamedTuple
+
+from modules.asset_bundle import AssetBundle, DEFAULT_BUNDLE_NAME
+from modules.checklist_stream import StreamingChecklistIndex
+from modules.metrics import metrics
+from modules.models import Stage, Topic, Checklist
+
+
+_EMPTY = MappingProxyType({})
+
+
+def freeze(value: Any) -> Any:
+    """将解析后的JSON递归转换为只读结构：dict→MappingProxyType，list→tuple"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """将只读结构和类型化记录还原为普通 dict/list，用于JSON序列化等需要可变对象的场景"""
+    if hasattr(value, "_asdict"):
+        return thaw(value._asdict())
+    if isinstance(value, (dict, MappingProxyType)):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+def _build_records(record_type, raws, filename: str) -> tuple:
+    """将原始数据校验并转换为类型化记录，校验失败的条目会被跳过"""
+    records = []
+    for raw in raws or ():
+        try:
+            records.append(record_type.from_dict(raw))
+        except (ValueError, TypeError, AttributeError) as e:
+            print(f"数据校验失败: {filename}: {e}")
+    return tuple(records)
+
+
+def _index_stages(data: Mapping[str, Any]) -> Mapping[str, Any]:
+    """构建阶段索引：按ID查找"""
+    stages = _build_records(Stage, data.get("stages"), "stages.json")
+    return MappingProxyType({
+        "all": stages,
+        "by_id": MappingProxyType({stage.id: stage for stage in stages}),
+    })
+
+
+def _index_topics(data: Mapping[str, Any]) -> Mapping[str, Any]:
+    """构建课题索引：按ID和所属阶段查找"""
+    topics = _build_records(Topic, data.get("topics"), "topics.json")
+    by_stage = {}
+    for topic in topics:
+        by_stage.setdefault(topic.stage_id, []).append(topic)
+    return MappingProxyType({
+        "all": topics,
+        "by_id": MappingProxyType({topic.id: topic for topic in topics}),
+        "by_stage": MappingProxyType({stage_id: tuple(items) for stage_id, items in by_stage.items()}),
+    })
+
+
+def _index_checklists(data: Mapping[str, Any]) -> Mapping[str, Any]:
+    """构建清单索引：按ID、所属课题查找，项目→清单→课题→阶段 的反向映射，以及项目权重"""
+    checklists = _build_records(Checklist, data.get("checklists"), "checklists.json")
+    by_topic = {}
+    item_location = {}
+    item_weight = {}
+    for checklist in checklists:
+        by_topic.setdefault(checklist.topic_id, []).append(checklist)
+        location = (checklist.id, checklist.topic_id, checklist.stage_id)
+        for item in checklist.items:
+            item_location[(checklist.id, item.id)] = location
+            item_weight[(checklist.id, item.id)] = item.weight
+    return MappingProxyType({
+        "all": checklists,
+        "by_id": MappingProxyType({checklist.id: checklist for checklist in checklists}),
+        "by_topic": MappingProxyType({topic_id: tuple(items) for topic_id, items in by_topic.items()}),
+        "item_location": MappingProxyType(item_location),
+        "item_weight": MappingProxyType(item_weight),
+    })
+
+
+# 各配置文件对应的 (顶层键, 索引构建函数)，文件加载时调用一次
+# 这些文件的数据以类型化记录保存，load_json 返回 {顶层键: 记录元组}
+_INDEX_BUILDERS = {
+    "stages.json": ("stages", _index_stages),
+    "topics.json": ("topics", _index_topics),
+    "checklists.json": ("checklists", _index_checklists),
+}
+
+
+class _AssetEntry(NamedTuple):
+    """单个配置文件的只读解析结果及其文件指纹"""
+    data: Mapping[str, Any]
+    index: Mapping[str, Any]
+    mtime_ns: int
+    size: int
+    digest: str
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    """读取布尔型环境变量"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
 
 class DataLoader:
-    """数据加载模块，负责加载所有配置文件"""
-    
-    def __init__(self, assets_path: str = "assets"):
+    """
+    数据加载模块，负责加载所有配置文件
+    返回的数据均为只读结构（MappingProxyType / tuple），由进程内所有会话共享
+    """
+
+    def __init__(self, assets_path: str = "assets", auto_reload: Optional[bool] = None,
+                 reload_interval: Optional[float] = None, bundle_path: Optional[str] = None,
+                 streaming_threshold: Optional[int] = None):
         self.assets_path = assets_path
-        self._cache = {}
-    
-    def load_json(self, filename: str) -> Dict[str, Any]:
+        # 清单文件超过该大小（字节）时改用流式索引，只按课题加载清单
+        self.streaming_threshold = (int(os.getenv("CHECKLIST_STREAMING_THRESHOLD", str(64 * 1024 * 1024)))
+                                    if streaming_threshold is None else streaming_threshold)
+        self.streaming_cache_topics = int(os.getenv("CHECKLIST_CACHE_TOPICS", "64"))
+        # 预编译配置包（python -m modules.asset_bundle 生成），过期或缺失时回退到JSON
+        bundle_path = bundle_path or os.getenv("ASSETS_BUNDLE_PATH") or os.path.join(assets_path, DEFAULT_BUNDLE_NAME)
+        self._bundle = AssetBundle(bundle_path)
+        # 热更新模式：定期检查文件修改时间和内容哈希，只重新解析有变化的文件
+        self.auto_reload = _env_flag("ASSETS_AUTO_RELOAD") if auto_reload is None else auto_reload
+        self.reload_interval = (float(os.getenv("ASSETS_RELOAD_INTERVAL", "2"))
+                                if reload_interval is None else reload_interval)
+        # 不可变快照，整体替换发布；读取无需加锁
+        self._snapshot = MappingProxyType({})
+        # 仅用于串行化写入（加载与重载）
+        self._lock = threading.Lock()
+        self._last_check = time.monotonic()
+
+    def load_json(self, filename: str) -> Mapping[str, Any]:
         """加载JSON文件"""
-        if filename in self._cache:
-            return self._cache[filename]
-        
+        entry = self._get_entry(filename)
+        return entry.data if entry else _EMPTY
+
+    def _get_index(self, filename: str) -> Mapping[str, Any]:
+        """获取文件的预建索引，必要时先加载文件"""
+        entry = self._get_entry(filename)
+        return entry.index if entry else _EMPTY
+
+    def _get_entry(self, filename: str) -> Optional[_AssetEntry]:
+        """从当前快照获取文件条目，首次访问时加载并发布"""
+        if self.auto_reload:
+            self._maybe_reload()
+
+        entry = self._snapshot.get(filename)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            entry = self._snapshot.get(filename)
+            if entry is None:
+                entry = self._read_entry(filename)
+                if entry is not None:
+                    self._publish({filename: entry})
+        return entry
+
+    def _read_entry(self, filename: str, previous: Optional[_AssetEntry] = None) -> Optional[_AssetEntry]:
+        """
+        读取并解析文件，优先从预编译配置包解码
+        文件指纹与 previous 一致时直接复用，不重新解析和建索引
+
+        Returns:
+            _AssetEntry: 文件条目，读取或解析失败时返回 None
+        """
         filepath = os.path.join(self.assets_path, filename)
+        started = time.perf_counter()
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self._cache[filename] = data
-                return data
+            stat = os.stat(filepath)
+            if previous and previous.mtime_ns == stat.st_mtime_ns and previous.size == stat.st_size:
+                return previous
+
+            if filename == "checklists.json" and stat.st_size >= self.streaming_threshold:
+                entry = self._read_streaming_entry(filepath, stat, previous)
+                metrics.observe("asset_load_seconds", time.perf_counter() - started,
+                                file=filename, source="stream")
+                return entry
+
+            bundled = self._bundle.load(filename, filepath, stat)
+            if bundled is not None:
+                data, digest = bundled
+            else:
+                with open(filepath, 'rb') as f:
+                    raw = f.read()
+                digest = hashlib.sha256(raw).hexdigest()
+                data = None
+
+            if previous and previous.digest == digest:
+                # 仅修改时间变化，内容未变
+                return previous._replace(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+
+            if data is None:
+                data = json.loads(raw.decode('utf-8'))
+            if filename in _INDEX_BUILDERS:
+                # 校验并转换为不可变记录，只保留记录，不再保留原始字典
+                key, builder = _INDEX_BUILDERS[filename]
+                index = builder(data)
+                data = MappingProxyType({key: index["all"]})
+            else:
+                # 冻结后在所有会话线程间共享同一份数据，无需防御性拷贝
+                data = freeze(data)
+                index = _EMPTY
+            metrics.observe("asset_load_seconds", time.perf_counter() - started,
+                            file=filename, source="bundle" if bundled is not None else "json")
+            return _AssetEntry(data, index, stat.st_mtime_ns, stat.st_size, digest)
         except FileNotFoundError:
             print(f"文件未找到: {filepath}")
-            return {}
-        except json.JSONDecodeError:
+            return None
+        except (json.JSONDecodeError, UnicodeDecodeError):
             print(f"JSON解析错误: {filepath}")
-            return {}
-    
-    def get_stages(self) -> List[Dict[str, Any]]:
+            return None
+
+    def _read_streaming_entry(self, filepath: str, stat: os.stat_result,
+                              previous: Optional[_AssetEntry]) -> _AssetEntry:
+        """以流式方式索引大型清单文件，文件内容不整体保留在内存中"""
+        stream = StreamingChecklistIndex(filepath, self.streaming_cache_topics)
+        digest = stream.scan()
+        if previous and previous.digest == digest:
+            return previous._replace(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        return _AssetEntry(_EMPTY, stream.as_index(), stat.st_mtime_ns, stat.st_size, digest)
+
+    def _publish(self, updates: Dict[str, _AssetEntry]):
+        """基于当前快照生成新快照并原子替换，调用方需持有写锁"""
+        entries = dict(self._snapshot)
+        entries.update(updates)
+        self._snapshot = MappingProxyType(entries)
+
+    def _maybe_reload(self):
+        """热更新模式下按间隔检查文件变化；已有线程在重载时直接使用旧快照"""
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._last_check = now
+            self._reload_locked()
+        finally:
+            self._lock.release()
+
+    def reload(self) -> List[str]:
+        """
+        检查所有已加载文件，重新解析内容有变化的文件
+
+        Returns:
+            list: 内容发生变化并已重新加载的文件名
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            return self._reload_locked()
+
+    def _reload_locked(self) -> List[str]:
+        """重载的具体实现，调用方需持有写锁"""
+        updates = {}
+        changed = []
+        for filename, entry in self._snapshot.items():
+            new_entry = self._read_entry(filename, entry)
+            if new_entry is None or new_entry is entry:
+                # 文件读取失败时保留旧数据
+                continue
+            updates[filename] = new_entry
+            if new_entry.digest != entry.digest:
+                changed.append(filename)
+
+        if updates:
+            self._publish(updates)
+        for filename in changed:
+            print(f"配置文件已重新加载: {filename}")
+        return changed
+
+    def get_stages(self) -> Tuple[Stage, ...]:
         """获取所有阶段数据"""
-        data = self.load_json("stages.json")
-        return data.get("stages", [])
-    
-    def get_stage_by_id(self, stage_id: int) -> Dict[str, Any]:
+        return self._get_index("stages.json").get("all", ())
+
+    def get_stage_by_id(self, stage_id: int) -> Optional[Stage]:
         """根据ID获取阶段数据"""
-        stages = self.get_stages()
-        for stage in stages:
-            if stage.get("id") == stage_id:
-                return stage
-        return {}
-    
-    def get_topics_by_stage(self, stage_id: int) -> List[Dict[str, Any]]:
+        return self._get_index("stages.json").get("by_id", _EMPTY).get(stage_id)
+
+    def get_topics_by_stage(self, stage_id: int) -> Tuple[Topic, ...]:
         """获取指定阶段的所有课题"""
-        data = self.load_json("topics.json")
-        topics = data.get("topics", [])
-        return [topic for topic in topics if topic.get("stage_id") == stage_id]
-    
-    def get_checklists_by_topic(self, topic_id: int) -> List[Dict[str, Any]]:
+        return self._get_index("topics.json").get("by_stage", _EMPTY).get(stage_id, ())
+
+    def get_topic_by_id(self, topic_id: int) -> Optional[Topic]:
+        """根据ID获取课题数据"""
+        return self._get_index("topics.json").get("by_id", _EMPTY).get(topic_id)
+
+    def get_checklists_by_topic(self, topic_id: int) -> Tuple[Checklist, ...]:
         """获取指定课题的所有清单"""
-        data = self.load_json("checklists.json")
-        checklists = data.get("checklists", [])
-        return [checklist for checklist in checklists if checklist.get("topic_id") == topic_id]
-    
-    def get_ui_config(self) -> Dict[str, Any]:
+        return self._get_index("checklists.json").get("by_topic", _EMPTY).get(topic_id, ())
+
+    def get_checklist_by_id(self, checklist_id: int) -> Optional[Checklist]:
+        """根据ID获取清单数据"""
+        return self._get_index("checklists.json").get("by_id", _EMPTY).get(checklist_id)
+
+    def get_item_location(self, checklist_id: int, item_id: int) -> Optional[Tuple[int, int, int]]:
+        """
+        根据清单项目定位其所属的清单、课题和阶段
+
+        Returns:
+            tuple: (checklist_id, topic_id, stage_id)，项目不存在时返回 None
+        """
+        location = self._get_index("checklists.json").get("item_location", _EMPTY).get((checklist_id, item_id))
+        if location is None:
+            return None
+
+        checklist_id, topic_id, stage_id = location
+        if stage_id is None:
+            # 清单未标注阶段时，通过所属课题回溯
+            topic = self.get_topic_by_id(topic_id)
+            stage_id = topic.stage_id if topic else None
+        return checklist_id, topic_id, stage_id
+
+    def get_item_weight(self, checklist_id: int, item_id: int) -> float:
+        """获取清单项目的权重，项目不存在时返回 0"""
+        return self._get_index("checklists.json").get("item_weight", _EMPTY).get((checklist_id, item_id), 0)
+
+    def get_checklist_item_keys(self) -> Iterable[Tuple[int, int]]:
+        """所有清单项目的 (checklist_id, item_id)"""
+        return self._get_index("checklists.json").get("item_location", _EMPTY).keys()
+
+    def get_ui_config(self) -> Mapping[str, Any]:
         """获取界面配置"""
         return self.load_json("ui_config.json")
-    
-    def get_chat_config(self) -> Dict[str, Any]:
+
+    def get_chat_config(self) -> Mapping[str, Any]:
         """获取聊天配置"""
         return self.load_json("chat_config.json")
-    
-    def get_function_panel_config(self) -> Dict[str, Any]:
+
+    def get_function_panel_config(self) -> Mapping[str, Any]:
         """获取功能面板配置"""
         return self.load_json("function_panel_config.json")
 
-# 创建全局数据加载器实例
+    def get_evaluator_config(self) -> Mapping[str, Any]:
+        """获取研究进度评估配置"""
+        return self.load_json("evaluator_config.json")
+
+    def get_evaluation_stages(self) -> Tuple[Mapping[str, Any], ...]:
+        """获取研究进度评估使用的阶段定义（阶段、目的和分组任务清单）"""
+        return self.load_json("evaluation_stages.json").get("stages", ())
+
+# 创建全局数据加载器实例（进程级共享的只读配置存储）
 data_loader = DataLoader()
\ No newline at end of file
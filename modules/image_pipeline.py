@@ -0,0 +1,167 @@
+import base64
+import hashlib
+import io
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from modules.metrics import metrics
+from modules.models import settings_from_config
+
+# 进程内缓存的已编码图片条数
+_MAX_ENTRIES = 32
+
+
+class ImageSettings(NamedTuple):
+    """上传图片的预处理配置"""
+    max_side: int = 1568              # 最长边像素上限
+    max_pixels: int = 1003520         # 总像素上限（千问默认 1280×28×28，视觉 token 数与像素数成正比）
+    jpeg_quality: int = 85            # 初始 JPEG 质量
+    min_quality: int = 50             # 压缩到 max_bytes 以内时允许的最低质量
+    max_bytes: int = 800000           # 编码后（base64 之前）的字节数上限
+    crop_whitespace: bool = True      # 是否裁掉四周的空白边
+    whitespace_threshold: int = 245   # 灰度高于该值的像素视为空白
+    crop_margin: int = 16             # 裁剪后保留的边距（像素）
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "ImageSettings":
+        """根据配置文件中的 image 段构建"""
+        return settings_from_config(cls, config)
+
+
+class ProcessedImage(NamedTuple):
+    """预处理后的图片"""
+    data_url: str        # data:image/jpeg;base64,...
+    digest: str          # 原始文件内容的 sha256
+    width: int
+    height: int
+    original_bytes: int
+    encoded_bytes: int
+
+
+class ImageProcessingError(Exception):
+    """上传的文件无法作为图片解码"""
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """转换为 RGB，透明区域按白色背景合成"""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _crop_whitespace(image: Image.Image, settings: ImageSettings) -> Image.Image:
+    """裁掉四周接近白色的边（截图的留白、聊天界面的空白区域）"""
+    mask = image.convert("L").point(lambda value: 255 if value < settings.whitespace_threshold else 0)
+    box = mask.getbbox()
+    if box is None:
+        # 整张图都是空白
+        return image
+    left, top, right, bottom = box
+    margin = settings.crop_margin
+    box = (max(0, left - margin), max(0, top - margin),
+           min(image.width, right + margin), min(image.height, bottom + margin))
+    if box == (0, 0, image.width, image.height):
+        return image
+    return image.crop(box)
+
+
+def _downsize(image: Image.Image, settings: ImageSettings, scale: float = 1.0) -> Image.Image:
+    """按最长边和总像素上限等比例缩小（不放大）"""
+    width, height = image.size
+    ratio = min(1.0, settings.max_side / max(width, height),
+                math.sqrt(settings.max_pixels / (width * height))) * scale
+    if ratio >= 1.0:
+        return image
+    size = (max(1, int(width * ratio)), max(1, int(height * ratio)))
+    return image.resize(size, Image.LANCZOS)
+
+
+def _encode_jpeg(image: Image.Image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+class ImagePipeline:
+    """
+    上传图片的本地预处理：校正方向 → 裁剪空白 → 缩小 → JPEG 重新压缩 → base64 data URL
+    结果按 (文件内容哈希, 配置) 缓存，同一张图片在多次评估和页面重新运行之间只处理一次
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[tuple, ProcessedImage]" = OrderedDict()
+
+    def process(self, data: bytes, settings: ImageSettings = ImageSettings()) -> ProcessedImage:
+        """
+        预处理图片
+
+        Args:
+            data (bytes): 上传文件的原始内容
+            settings (ImageSettings): 预处理配置
+
+        Returns:
+            ProcessedImage: 预处理结果
+
+        Raises:
+            ImageProcessingError: 文件不是可解码的图片
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        key = (digest, settings)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        started = time.perf_counter()
+        try:
+            with Image.open(io.BytesIO(data)) as source:
+                image = _flatten(ImageOps.exif_transpose(source))
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+            raise ImageProcessingError(f"无法读取图片: {e}") from e
+
+        if settings.crop_whitespace:
+            image = _crop_whitespace(image, settings)
+
+        # 先降低质量，仍超过大小上限时再逐步缩小尺寸
+        scale = 1.0
+        while True:
+            resized = _downsize(image, settings, scale)
+            quality = settings.jpeg_quality
+            encoded = _encode_jpeg(resized, quality)
+            while len(encoded) > settings.max_bytes and quality > settings.min_quality:
+                quality = max(settings.min_quality, quality - 10)
+                encoded = _encode_jpeg(resized, quality)
+            if len(encoded) <= settings.max_bytes or min(resized.size) <= 64:
+                break
+            scale *= 0.75
+
+        processed = ProcessedImage(
+            data_url="data:image/jpeg;base64," + base64.b64encode(encoded).decode("ascii"),
+            digest=digest,
+            width=resized.width,
+            height=resized.height,
+            original_bytes=len(data),
+            encoded_bytes=len(encoded),
+        )
+        metrics.observe("image_process_seconds", time.perf_counter() - started)
+        metrics.observe("image_bytes", len(data), stage="original")
+        metrics.observe("image_bytes", len(encoded), stage="encoded")
+
+        with self._lock:
+            self._cache[key] = processed
+            while len(self._cache) > _MAX_ENTRIES:
+                self._cache.popitem(last=False)
+        return processed
+
+# 创建全局图片预处理实例（进程内所有会话共享缓存）
+image_pipeline = ImagePipeline()
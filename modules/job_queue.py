@@ -0,0 +1,179 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from modules.metrics import metrics
+from modules.models import settings_from_config
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class JobSettings(NamedTuple):
+    """后台任务配置"""
+    max_workers: int = 4          # 同时执行的任务数上限，超出的任务排队
+    ttl_seconds: float = 3600     # 任务结束后结果保留的时间（秒）
+    poll_interval: float = 1.0    # 页面轮询任务状态的间隔（秒）
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "JobSettings":
+        """根据配置文件中的 jobs 段构建"""
+        return settings_from_config(cls, config)
+
+
+class Job:
+    """
+    一个后台任务
+    任务函数在线程池中执行，可通过 set_progress / append_progress 报告中间进度，
+    页面线程通过 snapshot 读取一致的状态副本
+    """
+
+    def __init__(self, job_id: str, name: str):
+        self.id = job_id
+        self.name = name
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._status = JOB_QUEUED
+        self._created_at = time.time()
+        self._started_at = None
+        self._finished_at = None
+        self._result = None
+        self._error = None
+        self._progress: Dict[str, Any] = {}
+
+    def set_progress(self, **values):
+        """设置进度字段"""
+        with self._lock:
+            self._progress.update(values)
+
+    def append_progress(self, key: str, item: Any):
+        """向列表型进度字段追加一项"""
+        with self._lock:
+            self._progress.setdefault(key, []).append(item)
+
+    def _start(self):
+        with self._lock:
+            self._status = JOB_RUNNING
+            self._started_at = time.time()
+
+    def _finish(self, result: Any = None, error: Optional[str] = None):
+        with self._lock:
+            self._status = JOB_FAILED if error is not None else JOB_DONE
+            self._result = result
+            self._error = error
+            self._finished_at = time.time()
+        self._done.set()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def finished_before(self, timestamp: float) -> bool:
+        with self._lock:
+            return self._finished_at is not None and self._finished_at < timestamp
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待任务结束，返回是否已结束"""
+        return self._done.wait(timeout)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取任务状态副本
+
+        Returns:
+            dict: id, name, status, elapsed（秒）, result, error, progress
+        """
+        with self._lock:
+            end = self._finished_at or time.time()
+            return {
+                "id": self.id,
+                "name": self.name,
+                "status": self._status,
+                "elapsed": end - self._created_at,
+                "result": self._result,
+                "error": self._error,
+                "progress": {key: list(value) if isinstance(value, list) else value
+                             for key, value in self._progress.items()},
+            }
+
+
+class JobQueue:
+    """
+    后台任务队列
+    耗时的模型调用在线程池中执行，不阻塞 Streamlit 脚本线程；页面重新运行、切换标签页时任务继续执行，
+    页面凭会话中保存的任务 ID 轮询结果。结束的任务在 ttl_seconds 后清除
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._max_workers = None
+        metrics.register_collector("job_queue", lambda: {"jobs_pending": self.pending_count()})
+
+    def _get_executor(self, settings: JobSettings) -> ThreadPoolExecutor:
+        """获取线程池，并发上限变化时为新任务创建新的线程池（旧线程池执行完已提交的任务后退出）"""
+        if self._executor is None or self._max_workers != settings.max_workers:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = ThreadPoolExecutor(max_workers=max(1, settings.max_workers),
+                                                thread_name_prefix="job")
+            self._max_workers = settings.max_workers
+        return self._executor
+
+    def _purge(self, settings: JobSettings):
+        """清除过期的已结束任务（调用方持有锁）"""
+        cutoff = time.time() - settings.ttl_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished_before(cutoff)]:
+            del self._jobs[job_id]
+
+    def submit(self, name: str, func: Callable[[Job], Any], settings: JobSettings = JobSettings()) -> Job:
+        """
+        提交任务
+
+        Args:
+            name (str): 任务类型（用于指标）
+            func (callable): 任务函数，以 Job 为参数，返回值作为任务结果
+            settings (JobSettings): 任务配置
+
+        Returns:
+            Job: 新任务
+        """
+        job = Job(uuid.uuid4().hex, name)
+
+        def run():
+            job._start()
+            try:
+                result = func(job)
+            except Exception as e:
+                print(f"后台任务失败 {name}: {e}")
+                metrics.inc("jobs_total", job=name, status=JOB_FAILED)
+                job._finish(error=str(e))
+            else:
+                metrics.inc("jobs_total", job=name, status=JOB_DONE)
+                job._finish(result=result)
+
+        with self._lock:
+            self._purge(settings)
+            self._jobs[job.id] = job
+            self._get_executor(settings).submit(run)
+        return job
+
+    def get(self, job_id: str, settings: JobSettings = JobSettings()) -> Optional[Job]:
+        """根据任务 ID 获取任务，不存在或已过期时返回 None"""
+        with self._lock:
+            self._purge(settings)
+            return self._jobs.get(job_id)
+
+    def pending_count(self) -> int:
+        """未结束的任务数"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+# 创建全局任务队列实例（进程内所有会话共享）
+job_queue = JobQueue()
@@ -0,0 +1,283 @@
+import ast
+import difflib
+import json
+import re
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+# Markdown 代码块标记（```json ... ```）
+_FENCE = re.compile(r"```[a-zA-Z]*[ \t]*\n?|```")
+# 截断输出末尾悬空的字段名（"key": 或 "key"）及其前面的逗号
+_DANGLING_KEY = re.compile(r',?\s*"(?:[^"\\]|\\.)*"\s*:?\s*$')
+# 模型常用的 Python 字面量
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+# 任务名称模糊匹配的最低相似度
+_NAME_CUTOFF = 0.6
+
+
+def strip_code_fences(text: str) -> str:
+    """去掉 Markdown 代码块标记"""
+    return _FENCE.sub("", text)
+
+
+def find_json_object(text: str) -> Optional[str]:
+    """
+    找出文本中最外层的 JSON 对象（忽略前后的说明文字）
+
+    Returns:
+        str: 从第一个 { 到与之匹配的 } 的文本；输出被截断、没有匹配的 } 时返回到文本末尾；没有 { 时返回 None
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = escape = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return text[start:]
+
+
+def repair_json(text: str) -> str:
+    """
+    修复常见的 JSON 格式问题：
+    注释、多余的尾逗号、True/False/None、字符串中未转义的换行，
+    以及输出被截断时未闭合的字符串和括号（丢弃最后一个不完整的字段）
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = escape = False
+    index = 0
+    length = len(text)
+    while index < length:
+        char = text[index]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            elif char == "\n":
+                char = "\\n"
+            elif char == "\t":
+                char = "\\t"
+            out.append(char)
+            index += 1
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char == "/" and text.startswith("//", index):
+            newline = text.find("\n", index)
+            index = length if newline < 0 else newline
+            continue
+        elif char == "/" and text.startswith("/*", index):
+            end = text.find("*/", index + 2)
+            index = length if end < 0 else end + 2
+            continue
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            # 去掉右括号前多余的逗号
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+        elif char.isalpha():
+            end = index
+            while end < length and (text[end].isalnum() or text[end] == "_"):
+                end += 1
+            word = text[index:end]
+            out.append(_LITERALS.get(word, word))
+            index = end
+            continue
+        out.append(char)
+        index += 1
+
+    if not stack and not in_string:
+        return "".join(out)
+
+    # 输出被截断：闭合字符串，丢弃不完整的末尾字段，再补齐括号
+    repaired = "".join(out)
+    if in_string:
+        if escape:
+            repaired = repaired[:-1]
+        repaired += '"'
+    repaired = repaired.rstrip()
+    if repaired.endswith(":") or (stack and stack[-1] == "}" and repaired.endswith('"')
+                                  and _ends_with_key(repaired)):
+        repaired = _DANGLING_KEY.sub("", repaired)
+    repaired = repaired.rstrip().rstrip(",")
+    return repaired + "".join(reversed(stack))
+
+
+def _ends_with_key(text: str) -> bool:
+    """截断的对象以字符串结尾时，判断该字符串是字段名（前面是 { 或 ,）还是字段值（前面是 :）"""
+    match = re.search(r'"(?:[^"\\]|\\.)*"$', text)
+    if match is None:
+        return False
+    before = text[:match.start()].rstrip()
+    return before.endswith(("{", ","))
+
+
+def extract_json(text: str) -> Optional[Any]:
+    """
+    从模型输出中提取 JSON 对象：先直接解析，失败时去掉代码块标记、截取最外层对象并修复后再解析
+
+    Returns:
+        解析结果，无法提取时返回 None
+    """
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        pass
+    if not text:
+        return None
+
+    candidate = find_json_object(strip_code_fences(text))
+    if candidate is None:
+        return None
+    for attempt in (candidate, repair_json(candidate)):
+        try:
+            return json.loads(attempt)
+        except json.JSONDecodeError:
+            continue
+    try:
+        # 单引号、True/False/None 等 Python 字面量写法
+        value = ast.literal_eval(candidate)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def _match_name(name: str, known: Sequence[str]) -> Optional[str]:
+    """将模型输出的名称对应到已知名称：完全相同、互相包含或足够相似"""
+    if name in known:
+        return name
+    stripped = name.strip()
+    for candidate in known:
+        if stripped and (stripped in candidate or candidate in stripped):
+            return candidate
+    matches = difflib.get_close_matches(stripped, known, n=1, cutoff=_NAME_CUTOFF)
+    return matches[0] if matches else None
+
+
+def _to_progress(value: Any) -> Optional[float]:
+    """
+    将进度值转换为 0~1 的小数：支持数字、数字字符串和百分数；
+    2~100 之间的数按百分比处理（如 85 表示 85%），其余超出范围的值截断到 0~1
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        text = value.strip()
+        percent = text.endswith("%")
+        try:
+            value = float(text.rstrip("%").strip())
+        except ValueError:
+            return None
+        if percent:
+            value /= 100
+    if not isinstance(value, (int, float)) or value != value:
+        return None
+    if 2 <= value <= 100:
+        value /= 100
+    return min(max(float(value), 0.0), 1.0)
+
+
+def _to_text(value: Any) -> str:
+    """将建议类字段统一为文本"""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return "\n".join(_to_text(item) for item in value if item)
+    if value is None:
+        return ""
+    return str(value)
+
+
+def validate_evaluation(data: Any, stages: Sequence[Mapping[str, Any]]) -> Tuple[Dict[str, Any], List[str], bool]:
+    """
+    按评估结果的结构校验并规范化
+
+    - current_stage 对应到阶段定义中的阶段名称
+    - tasks_progress 的子任务名称对应到该阶段的任务清单分组，进度限制在 0~1；
+      对应不上的子任务移到 unmatched_tasks，不作为任务进度显示
+    - advice / mentor_insights 统一为文本
+
+    Args:
+        data: 解析出的 JSON
+        stages: 阶段定义（evaluation_stages.json 中的 stages）
+
+    Returns:
+        tuple: (规范化后的结果, 修正或问题说明列表, 结果是否可用)
+        可用指阶段能对应到定义，且至少一半子任务能对应到任务清单；缺少建议等次要字段时仍可用
+    """
+    if not isinstance(data, dict):
+        return {}, ["输出不是 JSON 对象"], False
+
+    issues: List[str] = []
+    result = dict(data)
+    stage_names = [item.get("stage", "") for item in stages]
+
+    raw_stage = _to_text(data.get("current_stage"))
+    current_stage = _match_name(raw_stage, stage_names) if raw_stage else None
+    if current_stage is None:
+        issues.append(f"无法识别的阶段: {raw_stage or '缺失'}")
+    elif current_stage != raw_stage:
+        issues.append(f"阶段名称已修正: {raw_stage} → {current_stage}")
+    result["current_stage"] = current_stage or raw_stage
+
+    stage = next((item for item in stages if item.get("stage") == current_stage), None)
+    known_tasks = list(stage.get("checklist", {})) if stage else []
+    raw_progress = data.get("tasks_progress")
+    progress: Dict[str, float] = {}
+    unmatched: Dict[str, float] = {}
+    if isinstance(raw_progress, dict):
+        for name, value in raw_progress.items():
+            number = _to_progress(value)
+            if number is None:
+                issues.append(f"无法识别的进度值: {name}")
+                continue
+            if number != value:
+                issues.append(f"进度值已修正: {name}")
+            task = _match_name(str(name), known_tasks) if known_tasks else None
+            if task is None:
+                issues.append(f"子任务不在任务清单中: {name}")
+                unmatched[str(name)] = number
+                continue
+            if task != name:
+                issues.append(f"子任务名称已修正: {name} → {task}")
+            progress[task] = number
+    else:
+        issues.append("缺少子任务进度")
+    result["tasks_progress"] = progress
+    if unmatched:
+        result["unmatched_tasks"] = unmatched
+    else:
+        result.pop("unmatched_tasks", None)
+
+    for field in ("advice", "mentor_insights"):
+        text = _to_text(data.get(field))
+        if not text:
+            issues.append(f"缺少字段: {field}")
+        result[field] = text
+
+    usable = current_stage is not None and bool(progress) and len(progress) >= len(unmatched)
+    return result, issues, usable
@@ -0,0 +1,131 @@
+import json
+from typing import Any, List, Optional, Tuple, Union
+
+_WHITESPACE = " \t\r\n"
+
+# 路径中的一级：对象字段名或数组下标
+PathPart = Union[str, int]
+
+
+class _Frame:
+    """正在解析的对象或数组"""
+    __slots__ = ("kind", "start", "key", "expect_key")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind
+        self.start = start
+        # 对象为当前字段名，数组为当前元素下标
+        self.key: Optional[PathPart] = None if kind == "object" else 0
+        self.expect_key = kind == "object"
+
+
+class IncrementalJSONParser:
+    """
+    增量 JSON 解析器
+    逐段输入模型的流式输出，每当一个字段的值完整时立即产出 (路径, 值)，
+    不必等待整个 JSON 结束。第一个 { 或 [ 之前的内容（如 ```json 代码块标记）会被忽略。
+
+    例如输入 {"advice": "...", "tasks_progress": {"选题": 0.8}} 会依次产出：
+        (("advice",), "..."), (("tasks_progress", "选题"), 0.8), (("tasks_progress",), {...})
+    """
+
+    def __init__(self, max_depth: int = 2):
+        """
+        Args:
+            max_depth (int): 只产出路径长度不超过该值的字段
+        """
+        self.max_depth = max_depth
+        self.text = ""
+        self.result: Any = None
+        self.done = False
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._scalar_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[Tuple[PathPart, ...], Any]]:
+        """
+        输入一段文本
+
+        Returns:
+            list: 本段文本中完整解析出的 [(路径, 值), ...]
+        """
+        self.text += chunk
+        events = []
+        text = self.text
+        for index in range(self._pos, len(text)):
+            if self.done:
+                break
+            self._step(text, index, text[index], events)
+        self._pos = len(text)
+        return events
+
+    def _step(self, text: str, index: int, char: str, events: list):
+        """处理一个字符"""
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                frame = self._stack[-1]
+                if frame.kind == "object" and frame.expect_key:
+                    frame.key = self._decode(text[self._string_start:index + 1])
+                    frame.expect_key = False
+                else:
+                    self._complete(self._string_start, index + 1, events)
+            return
+
+        if self._scalar_start is not None:
+            if char not in _WHITESPACE and char not in ",]}":
+                return
+            self._complete(self._scalar_start, index, events)
+            self._scalar_start = None
+
+        if not self._stack:
+            # 等待根对象开始
+            if char in "{[":
+                self._stack.append(_Frame("object" if char == "{" else "array", index))
+            return
+
+        frame = self._stack[-1]
+        if char in _WHITESPACE or char == ":":
+            return
+        if char == '"':
+            self._in_string = True
+            self._string_start = index
+        elif char in "{[":
+            self._stack.append(_Frame("object" if char == "{" else "array", index))
+        elif char in "}]":
+            self._stack.pop()
+            if self._stack:
+                self._complete(frame.start, index + 1, events)
+            else:
+                self.done = True
+                self.result = self._decode(text[frame.start:index + 1])
+        elif char == ",":
+            if frame.kind == "object":
+                frame.expect_key = True
+            else:
+                frame.key += 1
+        else:
+            # 数字、true/false/null
+            self._scalar_start = index
+
+    def _complete(self, start: int, end: int, events: list):
+        """当前字段的值在 text[start:end] 结束"""
+        if len(self._stack) > self.max_depth:
+            return
+        value = self._decode(self.text[start:end])
+        if value is not None:
+            events.append((tuple(frame.key for frame in self._stack), value))
+
+    @staticmethod
+    def _decode(raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return None
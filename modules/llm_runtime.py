@@ -0,0 +1,345 @@
+import asyncio
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional, Tuple
+
+from openai import AsyncOpenAI, Timeout
+
+from modules.metrics import metrics
+from modules.rate_limiter import (RateLimitSettings, estimate_request_tokens, rate_limit_key,
+                                  rate_limiter)
+from modules.resilience import (CircuitBreaker, LatencyWindow, ResiliencePolicy,
+                                call_with_resilience, is_transient_error, retry_after_seconds)
+
+# 被替换的客户端等待进行中的请求结束时的检查间隔（秒）
+_CLOSE_POLL_INTERVAL = 0.5
+
+
+class ProviderConfig(NamedTuple):
+    """单个模型服务商的连接配置"""
+    api_key: str
+    base_url: str
+    max_concurrency: int = 10
+    connect_timeout: float = 5
+    read_timeout: float = 30
+    resilience: ResiliencePolicy = ResiliencePolicy()
+    rate_limit: RateLimitSettings = RateLimitSettings()
+
+    @classmethod
+    def from_pool_config(cls, api_key: str, base_url: str, pool_config: Dict[str, Any],
+                         resilience_config: Optional[Dict[str, Any]] = None,
+                         rate_limit_config: Optional[Dict[str, Any]] = None) -> "ProviderConfig":
+        """
+        根据配置文件中的 connection_pool、resilience 和 rate_limit 段构建
+        connection_pool 沿用原 requests 连接池的字段：pool_size 作为并发上限，超时用于 AsyncOpenAI 的连接池
+        """
+        return cls(
+            api_key=api_key,
+            base_url=base_url,
+            max_concurrency=int(pool_config.get("pool_size", 10)),
+            connect_timeout=float(pool_config.get("connect_timeout", 5)),
+            read_timeout=float(pool_config.get("read_timeout", 30)),
+            resilience=ResiliencePolicy.from_config(resilience_config),
+            rate_limit=RateLimitSettings.from_config(rate_limit_config),
+        )
+
+
+class _Provider:
+    """事件循环线程内持有的服务商客户端与并发信号量"""
+
+    def __init__(self, config: ProviderConfig):
+        self.config = config
+        self.client = AsyncOpenAI(
+            api_key=config.api_key,
+            base_url=config.base_url,
+            timeout=Timeout(config.read_timeout, connect=config.connect_timeout),
+            # 重试由 call_with_resilience 统一负责
+            max_retries=0,
+        )
+        self.semaphore = asyncio.Semaphore(config.max_concurrency)
+        # 使用该客户端、尚未结束的调用数（含重试和对冲）
+        self.active = 0
+
+    async def aclose(self):
+        """等待进行中的调用结束后关闭客户端，释放其连接池"""
+        while self.active:
+            await asyncio.sleep(_CLOSE_POLL_INTERVAL)
+        await self.client.close()
+
+
+def _request_chars(params: Dict[str, Any]) -> int:
+    """请求消息的字符数（多模态消息中的图片按 URL 长度计）"""
+    total = 0
+    for message in params.get("messages", ()):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            total += len(content)
+            continue
+        for part in content or ():
+            if part.get("type") == "text":
+                total += len(part.get("text", ""))
+            else:
+                total += len(part.get("image_url", {}).get("url", ""))
+    return total
+
+
+def _record_usage(name: str, usage: Any):
+    """累计响应中的 token 用量"""
+    if usage is None:
+        return
+    metrics.inc("llm_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, provider=name, type="prompt")
+    metrics.inc("llm_tokens_total", getattr(usage, "completion_tokens", 0) or 0, provider=name, type="completion")
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) or getattr(usage, "prompt_cache_hit_tokens", None)
+    if cached:
+        metrics.inc("llm_tokens_total", cached, provider=name, type="cached_prompt")
+
+
+_DONE = object()
+
+
+class _Failure:
+    """跨线程传递流式请求中的异常"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class LLMRuntime:
+    """
+    异步 LLM 客户端核心
+    所有请求在一个专用事件循环线程中执行，各服务商共享一个客户端（连接池）
+    并由信号量限制并发；Streamlit 脚本线程通过同步接口调用
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        # 仅在事件循环线程中读写
+        self._providers: Dict[str, _Provider] = {}
+        # 按服务端点（base_url）记录熔断状态和耗时，配置热更新后仍然保留
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, LatencyWindow] = {}
+        # 正在关闭的旧客户端任务（保留引用，避免任务被回收）
+        self._closing = set()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """首次使用时启动事件循环线程"""
+        if self._loop is not None:
+            return self._loop
+
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="llm-runtime", daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def _get_provider(self, name: str, config: ProviderConfig) -> _Provider:
+        """
+        获取服务商客户端（在事件循环线程中调用）
+        配置变化（例如热更新）时重建，旧客户端在其上的请求结束后关闭
+        """
+        provider = self._providers.get(name)
+        if provider is None or provider.config != config:
+            old = provider
+            provider = _Provider(config)
+            self._providers[name] = provider
+            if old is not None:
+                task = asyncio.get_running_loop().create_task(old.aclose())
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+        return provider
+
+    def _endpoint_state(self, config: ProviderConfig) -> Tuple[CircuitBreaker, LatencyWindow]:
+        """获取服务端点的熔断器和耗时窗口"""
+        breaker = self._breakers.get(config.base_url)
+        if breaker is None:
+            breaker = self._breakers[config.base_url] = CircuitBreaker(config.base_url)
+            self._latencies[config.base_url] = LatencyWindow()
+        return breaker, self._latencies[config.base_url]
+
+    def circuit_open(self, config: ProviderConfig) -> bool:
+        """服务端点当前是否处于熔断状态"""
+        breaker = self._breakers.get(config.base_url)
+        return breaker is not None and breaker.is_open
+
+    def submit(self, coro) -> "asyncio.Future":
+        """将协程提交到事件循环线程"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    async def acomplete(self, name: str, config: ProviderConfig, **params) -> Any:
+        """异步调用 chat.completions.create（非流式），带重试、熔断和对冲请求"""
+        provider = self._get_provider(name, config)
+        breaker, latency = self._endpoint_state(config)
+
+        async def call():
+            async with provider.semaphore:
+                return await provider.client.chat.completions.create(**params)
+
+        async def hedge_allowed():
+            # 对冲请求同样计入限流配额；配额不足或有请求排队时不对冲，只等待原请求
+            if not config.rate_limit.enabled:
+                return True
+            allowed = await asyncio.get_running_loop().run_in_executor(
+                None, rate_limiter.try_acquire, rate_limit_key(config.api_key, config.base_url),
+                estimate_request_tokens(params), config.rate_limit)
+            if not allowed:
+                metrics.inc("llm_hedges_skipped_total", provider=name)
+            return allowed
+
+        metrics.observe("llm_request_chars", _request_chars(params), provider=name)
+        started = time.perf_counter()
+        provider.active += 1
+        try:
+            completion = await call_with_resilience(call, config.resilience, breaker, latency, hedge_allowed)
+        except Exception as e:
+            metrics.inc("llm_errors_total", provider=name, error=type(e).__name__)
+            raise
+        finally:
+            provider.active -= 1
+            metrics.observe("llm_request_seconds", time.perf_counter() - started, provider=name, mode="complete")
+
+        if completion.choices:
+            metrics.observe("llm_response_chars", len(completion.choices[0].message.content or ""), provider=name)
+        _record_usage(name, getattr(completion, "usage", None))
+        return completion
+
+    async def astream(self, name: str, config: ProviderConfig, **params):
+        """异步流式调用，逐个返回 chunk，并记录首字延迟、总耗时和用量"""
+        metrics.observe("llm_request_chars", _request_chars(params), provider=name)
+        started = time.perf_counter()
+        first_chunk = True
+        response_chars = 0
+        try:
+            async for chunk in self._astream_with_retry(name, config, **params):
+                if first_chunk:
+                    first_chunk = False
+                    metrics.observe("llm_ttfb_seconds", time.perf_counter() - started, provider=name)
+                if chunk.choices:
+                    response_chars += len(chunk.choices[0].delta.content or "")
+                _record_usage(name, getattr(chunk, "usage", None))
+                yield chunk
+        except Exception as e:
+            metrics.inc("llm_errors_total", provider=name, error=type(e).__name__)
+            raise
+        finally:
+            metrics.observe("llm_request_seconds", time.perf_counter() - started, provider=name, mode="stream")
+            metrics.observe("llm_response_chars", response_chars, provider=name)
+
+    async def _astream_with_retry(self, name: str, config: ProviderConfig, **params):
+        """
+        流式请求
+        只在收到第一个 chunk 之前重试，已输出的内容不会重复；流式请求不做对冲
+        """
+        provider = self._get_provider(name, config)
+        breaker, _ = self._endpoint_state(config)
+        policy = config.resilience
+        attempt = 0
+        provider.active += 1
+        try:
+            while True:
+                attempt += 1
+                breaker.before_call(policy)
+                started = False
+                try:
+                    async with provider.semaphore:
+                        # 最后一个 chunk 携带 usage，用于限流结算
+                        stream = await provider.client.chat.completions.create(
+                            stream=True, stream_options={"include_usage": True}, **params)
+                        async for chunk in stream:
+                            if not started:
+                                started = True
+                                breaker.record_success()
+                            yield chunk
+                except Exception as e:
+                    if started:
+                        raise
+                    if not is_transient_error(e):
+                        breaker.record_success()
+                        raise
+                    breaker.record_failure(policy)
+                    if attempt >= policy.max_attempts or breaker.is_open:
+                        raise
+                    metrics.inc("llm_retries_total", endpoint=breaker.name)
+                    await asyncio.sleep(policy.backoff(attempt, retry_after_seconds(e)))
+                    continue
+                except BaseException:
+                    if not started:
+                        breaker.release_probe()
+                    raise
+                if not started:
+                    breaker.record_success()
+                return
+        finally:
+            provider.active -= 1
+
+    def _settle(self, config: ProviderConfig, estimated: int, usage: Any):
+        """按响应中的 usage 结算限流配额"""
+        total = getattr(usage, "total_tokens", None)
+        if total:
+            rate_limiter.settle(rate_limit_key(config.api_key, config.base_url), estimated, total,
+                                config.rate_limit)
+
+    def complete(self, name: str, config: ProviderConfig,
+                 on_wait: Optional[Callable[[int, float], None]] = None, **params) -> Any:
+        """
+        同步调用接口：按 API 密钥排队取得配额后，阻塞等待事件循环线程中的请求完成
+
+        Args:
+            name (str): 服务商名称（用于共享客户端和并发限制）
+            config (ProviderConfig): 服务商连接配置
+            on_wait (callable): 限流排队时以 (排队位置, 已等待秒数) 调用
+            **params: 透传给 chat.completions.create 的参数
+
+        Returns:
+            ChatCompletion: 模型返回结果
+        """
+        estimated = estimate_request_tokens(params)
+        with metrics.timer("rate_limit_wait_seconds", provider=name):
+            rate_limiter.acquire(rate_limit_key(config.api_key, config.base_url), estimated,
+                                 config.rate_limit, on_wait)
+        completion = self.submit(self.acomplete(name, config, **params)).result()
+        self._settle(config, estimated, getattr(completion, "usage", None))
+        return completion
+
+    def stream(self, name: str, config: ProviderConfig,
+               on_wait: Optional[Callable[[int, float], None]] = None, **params) -> Iterator[Any]:
+        """
+        同步流式接口：在调用线程中逐个返回 chunk
+        调用方提前停止迭代时会取消事件循环中的请求
+        """
+        estimated = estimate_request_tokens(params)
+        with metrics.timer("rate_limit_wait_seconds", provider=name):
+            rate_limiter.acquire(rate_limit_key(config.api_key, config.base_url), estimated,
+                                 config.rate_limit, on_wait)
+        chunks: "queue.Queue" = queue.Queue()
+
+        async def pump():
+            try:
+                async for chunk in self.astream(name, config, **params):
+                    chunks.put(chunk)
+            except BaseException as e:
+                chunks.put(_Failure(e))
+                raise
+            finally:
+                chunks.put(_DONE)
+
+        future = self.submit(pump())
+        try:
+            while True:
+                item = chunks.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.error
+                if getattr(item, "usage", None) is not None:
+                    self._settle(config, estimated, item.usage)
+                yield item
+        finally:
+            future.cancel()
+
+# 创建全局 LLM 运行时实例（进程内所有会话共享）
+llm_runtime = LLMRuntime()
@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# 指标名统一前缀
+METRIC_PREFIX = "paperbuddy_"
+# 滚动直方图输出的分位数
+QUANTILES = (0.5, 0.95, 0.99)
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> _LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: _LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    """生成 Prometheus 文本格式的标签部分"""
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+class RollingHistogram:
+    """
+    滚动窗口直方图
+    分位数只基于最近 max_samples 个且不超过 max_age 秒的样本，count/sum 为进程启动以来的累计值
+    """
+
+    def __init__(self, max_samples: int = 2048, max_age: float = 600):
+        self.max_age = max_age
+        self._samples: deque = deque(maxlen=max_samples)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._samples.append((time.monotonic(), value))
+            self.count += 1
+            self.sum += value
+
+    def window(self) -> List[float]:
+        """窗口内的样本（已排序）"""
+        cutoff = time.monotonic() - self.max_age
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            values = [value for _, value in self._samples]
+        values.sort()
+        return values
+
+    def summary(self) -> Dict[str, float]:
+        """窗口内的分位数和均值，以及累计的 count/sum"""
+        values = self.window()
+        result = {"count": self.count, "sum": self.sum, "window": len(values)}
+        result["mean"] = sum(values) / len(values) if values else 0.0
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+        return result
+
+
+class MetricsRegistry:
+    """
+    进程内指标注册表
+    - 计数器（inc）：请求数、错误数、token 用量等累计值
+    - 滚动直方图（observe / timer）：耗时、首字延迟、请求与响应大小
+    - 采集函数（register_collector）：导出时读取的瞬时值，例如缓存命中统计
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[_LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[_LabelKey, RollingHistogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        # 已提示过的无效 METRICS_PORT，避免每次重新运行脚本都打印
+        self._invalid_port: Optional[str] = None
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """累加计数器"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """记录一个直方图样本"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = RollingHistogram()
+        histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """记录代码块耗时（秒），代码块抛出异常时同样记录"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def describe(self, name: str, text: str):
+        """设置指标说明（Prometheus 的 HELP 行）"""
+        self._help[name] = text
+
+    def register_collector(self, name: str, collect: Callable[[], Dict[str, float]]):
+        """注册导出时调用的采集函数，返回 {指标名: 值}，同名采集函数会被替换"""
+        with self._lock:
+            self._collectors[name] = collect
+
+    def _collected(self) -> Dict[str, float]:
+        with self._lock:
+            collectors = list(self._collectors.items())
+        values = {}
+        for name, collect in collectors:
+            try:
+                values.update(collect())
+            except Exception as e:
+                print(f"指标采集失败 {name}: {e}")
+        return values
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取全部指标
+
+        Returns:
+            dict: {"counters": [...], "histograms": [...], "gauges": {...}}
+        """
+        with self._lock:
+            counters = [(name, key, value) for name, series in self._counters.items()
+                        for key, value in series.items()]
+            histograms = [(name, key, histogram) for name, series in self._histograms.items()
+                          for key, histogram in series.items()]
+        return {
+            "counters": [{"name": name, "labels": dict(key), "value": value}
+                         for name, key, value in sorted(counters, key=lambda item: (item[0], item[1]))],
+            "histograms": [{"name": name, "labels": dict(key), **histogram.summary()}
+                           for name, key, histogram in sorted(histograms, key=lambda item: (item[0], item[1]))],
+            "gauges": self._collected(),
+        }
+
+    def to_json(self) -> str:
+        """JSON 格式导出"""
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式导出（直方图以 summary 类型输出窗口分位数）"""
+        snapshot = self.snapshot()
+        lines = []
+        declared = set()
+
+        def declare(name: str, kind: str):
+            if name in declared:
+                return
+            declared.add(name)
+            if name in self._help:
+                lines.append(f"# HELP {METRIC_PREFIX}{name} {self._help[name]}")
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+
+        for counter in snapshot["counters"]:
+            declare(counter["name"], "counter")
+            labels = _format_labels(_label_key(counter["labels"]))
+            lines.append(f"{METRIC_PREFIX}{counter['name']}{labels} {counter['value']:g}")
+
+        for histogram in snapshot["histograms"]:
+            name = histogram["name"]
+            declare(name, "summary")
+            key = _label_key(histogram["labels"])
+            for q in QUANTILES:
+                labels = _format_labels(key, ("quantile", f"{q:g}"))
+                lines.append(f"{METRIC_PREFIX}{name}{labels} {histogram[f'p{int(q * 100)}']:g}")
+            lines.append(f"{METRIC_PREFIX}{name}_sum{_format_labels(key)} {histogram['sum']:g}")
+            lines.append(f"{METRIC_PREFIX}{name}_count{_format_labels(key)} {histogram['count']:g}")
+
+        for name, value in sorted(snapshot["gauges"].items()):
+            declare(name, "gauge")
+            lines.append(f"{METRIC_PREFIX}{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, port: int, host: str = "127.0.0.1") -> bool:
+        """
+        启动指标 HTTP 服务：/metrics 为 Prometheus 文本格式，/metrics.json 为 JSON
+        同一进程只启动一次（Streamlit 每次重新运行脚本都会调用）
+        服务没有鉴权，默认只监听本机地址
+
+        Returns:
+            bool: 本次调用是否启动了服务
+        """
+        with self._lock:
+            if self._server is not None:
+                return False
+            registry = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def log_message(self, format, *args):
+                    pass
+
+                def do_GET(self):
+                    path = self.path.split("?", 1)[0].rstrip("/")
+                    if path == "/metrics":
+                        body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+                    elif path == "/metrics.json":
+                        body, content_type = registry.to_json(), "application/json"
+                    else:
+                        self.send_error(404)
+                        return
+                    data = body.encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+
+            try:
+                server = ThreadingHTTPServer((host, port), Handler)
+            except OSError as e:
+                print(f"指标服务启动失败（端口 {port}）: {e}")
+                return False
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            self._server = server
+            return True
+
+    def start_server_from_env(self) -> bool:
+        """设置了环境变量 METRICS_PORT 时启动指标 HTTP 服务（监听 METRICS_HOST，默认 127.0.0.1）"""
+        port = os.getenv("METRICS_PORT")
+        if not port or self._server is not None or port == self._invalid_port:
+            return False
+        try:
+            port_number = int(port)
+            if not 0 < port_number < 65536:
+                raise ValueError(port)
+        except ValueError:
+            print(f"指标服务未启动：METRICS_PORT 不是有效的端口号: {port}")
+            self._invalid_port = port
+            return False
+        return self.start_http_server(port_number, os.getenv("METRICS_HOST", "127.0.0.1"))
+
+# 创建全局指标注册表实例（进程内所有会话共享）
+metrics = MetricsRegistry()
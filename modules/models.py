@@ -0,0 +1,145 @@
+from typing import Any, Mapping, NamedTuple, Optional, Tuple, Type, TypeVar
+
+# 配置数据的类型化记录
+# 基于 NamedTuple（__slots__ = ()），实例不可变且没有 __dict__，
+# 字段在加载配置时校验一次，之后各模块直接通过属性访问
+
+
+def _require_int(raw: Mapping[str, Any], key: str, kind: str) -> int:
+    """读取必填的整数字段"""
+    value = raw.get(key)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"{kind}缺少有效的 {key}: {value!r}")
+    return value
+
+
+def _optional_int(raw: Mapping[str, Any], key: str, kind: str) -> Optional[int]:
+    """读取可选的整数字段"""
+    if raw.get(key) is None:
+        return None
+    return _require_int(raw, key, kind)
+
+
+def _str(raw: Mapping[str, Any], key: str, kind: str) -> str:
+    """读取字符串字段，缺省为空字符串"""
+    value = raw.get(key, "")
+    if not isinstance(value, str):
+        raise ValueError(f"{kind}的 {key} 必须是字符串: {value!r}")
+    return value
+
+
+def _id_tuple(raw: Mapping[str, Any], key: str, kind: str) -> Tuple[int, ...]:
+    """读取ID列表字段"""
+    values = raw.get(key) or ()
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        raise ValueError(f"{kind}的 {key} 必须是整数列表: {values!r}")
+    return tuple(values)
+
+
+_Settings = TypeVar("_Settings", bound=tuple)
+
+
+def settings_from_config(cls: Type[_Settings], config: Optional[Mapping[str, Any]],
+                         defaults: Optional[_Settings] = None) -> _Settings:
+    """
+    根据配置段构建 NamedTuple 形式的设置：配置中出现的字段按默认值的类型转换，缺省字段使用默认值
+
+    Args:
+        cls: 所有字段都有默认值的 NamedTuple 类
+        config (dict): 配置文件中对应的段，可为 None
+        defaults: 代替类默认值的实例（同一设置类在不同场景下默认值不同时使用）
+    """
+    base = defaults if defaults is not None else cls()
+    config = config or {}
+    return base._replace(**{field: type(getattr(base, field))(config[field])
+                            for field in cls._fields if field in config})
+
+
+class Stage(NamedTuple):
+    """科研阶段"""
+    id: int
+    name: str = ""
+    description: str = ""
+    icon: str = ""
+    color: str = ""
+    progress: float = 0
+    topics: Tuple[int, ...] = ()
+    checklists: Tuple[int, ...] = ()
+
+    @classmethod
+    def from_dict(cls, raw: Mapping[str, Any]) -> "Stage":
+        """从配置数据构建并校验阶段记录"""
+        progress = raw.get("progress", 0)
+        if not isinstance(progress, (int, float)):
+            raise ValueError(f"阶段的 progress 必须是数字: {progress!r}")
+        return cls(
+            id=_require_int(raw, "id", "阶段"),
+            name=_str(raw, "name", "阶段"),
+            description=_str(raw, "description", "阶段"),
+            icon=_str(raw, "icon", "阶段"),
+            color=_str(raw, "color", "阶段"),
+            progress=progress,
+            topics=_id_tuple(raw, "topics", "阶段"),
+            checklists=_id_tuple(raw, "checklists", "阶段"),
+        )
+
+
+class Topic(NamedTuple):
+    """训练课题"""
+    id: Optional[int]
+    stage_id: Optional[int] = None
+    name: str = ""
+    description: str = ""
+    difficulty: str = ""
+
+    @classmethod
+    def from_dict(cls, raw: Mapping[str, Any]) -> "Topic":
+        """从配置数据构建并校验课题记录"""
+        return cls(
+            id=_require_int(raw, "id", "课题"),
+            stage_id=_require_int(raw, "stage_id", "课题"),
+            name=_str(raw, "name", "课题"),
+            description=_str(raw, "description", "课题"),
+            difficulty=_str(raw, "difficulty", "课题"),
+        )
+
+
+class ChecklistItem(NamedTuple):
+    """清单中的单个任务项"""
+    id: int
+    description: str = ""
+    weight: float = 0
+    completed: bool = False
+
+    @classmethod
+    def from_dict(cls, raw: Mapping[str, Any]) -> "ChecklistItem":
+        """从配置数据构建并校验任务项记录"""
+        weight = raw.get("weight", 0)
+        if not isinstance(weight, (int, float)) or isinstance(weight, bool) or weight < 0:
+            raise ValueError(f"任务项的 weight 必须是非负数字: {weight!r}")
+        return cls(
+            id=_require_int(raw, "id", "任务项"),
+            description=_str(raw, "description", "任务项"),
+            weight=weight,
+            completed=bool(raw.get("completed", False)),
+        )
+
+
+class Checklist(NamedTuple):
+    """课题任务清单"""
+    id: int
+    topic_id: int
+    stage_id: Optional[int] = None
+    name: str = ""
+    items: Tuple[ChecklistItem, ...] = ()
+
+    @classmethod
+    def from_dict(cls, raw: Mapping[str, Any]) -> "Checklist":
+        """从配置数据构建并校验清单记录"""
+        return cls(
+            id=_require_int(raw, "id", "清单"),
+            topic_id=_require_int(raw, "topic_id", "清单"),
+            stage_id=_optional_int(raw, "stage_id", "清单"),
+            name=_str(raw, "name", "清单"),
+            items=tuple(ChecklistItem.from_dict(item) for item in raw.get("items") or ()),
+        )
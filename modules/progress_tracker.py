@@ -10,66 +10,128 @@ class ProgressTracker:
     
     def update_progress(self):
         """
-        更新用户进度
-        计算当前阶段的完成度和得分
+        重新计算全部进度汇总
+        遍历所有清单项目，按课题和阶段统计项目总数、完成数和加权得分，保存到会话状态，
+        并据此更新各阶段完成度和总得分。只在导入、重置进度或汇总缺失时调用，勾选清单项目时按增量更新
         """
-        selected_stage = session_manager.get_selected_stage()
-        selected_topic = session_manager.get_selected_topic()
+        aggregates = {'topics': {}, 'stages': {}, 'total_score': 0}
         
-        if not selected_stage:
-            return
+        for checklist_id, item_id in self.data_loader.get_checklist_item_keys():
+            location = self.data_loader.get_item_location(checklist_id, item_id)
+            if location:
+                for entry in self._aggregate_entries(aggregates, location):
+                    entry['total'] += 1
+        
+        for key, completed in session_manager.get_checklist_progress().items():
+            parsed = self._parse_key(key)
+            if not completed or parsed is None:
+                continue
+            checklist_id, item_id = parsed
+            location = self.data_loader.get_item_location(checklist_id, item_id)
+            if location:
+                self._apply_delta(aggregates, location, checklist_id, item_id, 1)
+        
+        session_manager.set_progress_aggregates(aggregates)
+        
+        # 有完成项目的阶段记录完成度
+        user_progress = session_manager.get_user_progress()
+        user_progress['stage_progress'] = {
+            stage_id: self._percentage(entry)
+            for stage_id, entry in aggregates['stages'].items() if entry['completed']
+        }
+        user_progress['total_score'] = aggregates['total_score']
+        session_manager.set_user_progress(user_progress)
+    
+    def _get_aggregates(self):
+        """获取会话中的进度汇总，缺失时（新会话）重新计算"""
+        aggregates = session_manager.get_progress_aggregates()
+        if aggregates is None:
+            self.update_progress()
+            aggregates = session_manager.get_progress_aggregates()
+        return aggregates
+    
+    @staticmethod
+    def _parse_key(key):
+        """
+        解析清单进度的键 "清单ID_项目ID"
+        
+        Returns:
+            tuple: (checklist_id, item_id)，格式不正确（例如导入的数据）时返回 None
+        """
+        parts = str(key).split('_')
+        if len(parts) != 2:
+            return None
+        try:
+            return int(parts[0]), int(parts[1])
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def _aggregate_entries(aggregates, location):
+        """项目所属课题和阶段的汇总项"""
+        _, topic_id, stage_id = location
+        for group, key in (('topics', topic_id), ('stages', stage_id)):
+            yield aggregates[group].setdefault(key, {'total': 0, 'completed': 0, 'score': 0})
+    
+    def _apply_delta(self, aggregates, location, checklist_id, item_id, delta):
+        """
+        按一个项目的完成状态变化更新汇总
         
-        stage_id = selected_stage.get("id")
-        topic_id = selected_topic.get("id") if selected_topic else None
-        
-        # 获取当前课题的清单
-        checklists = self.data_loader.get_checklists_by_topic(topic_id) if topic_id else []
-        
-        total_items = 0
-        completed_items = 0
-        total_score = 0
-        
-        for checklist in checklists:
-            for item in checklist.get("items", []):
-                total_items += 1
-                item_id = f"{checklist['id']}_{item['id']}"
-                if session_manager.get_checklist_progress().get(item_id, False):
-                    completed_items += 1
-                    total_score += item.get("weight", 0) * 100
-        
-        # 更新进度
-        if total_items > 0:
-            progress_percentage = (completed_items / total_items) * 100
-            session_manager.update_stage_progress(stage_id, progress_percentage)
-            session_manager.update_total_score(total_score)
+        Args:
+            delta (int): 1 为完成，-1 为取消完成
+        """
+        score = self.data_loader.get_item_weight(checklist_id, item_id) * 100 * delta
+        for entry in self._aggregate_entries(aggregates, location):
+            entry['completed'] += delta
+            # 反复勾选时避免浮点误差累积
+            entry['score'] = round(entry['score'] + score, 6)
+        aggregates['total_score'] = round(aggregates['total_score'] + score, 6)
+    
+    @staticmethod
+    def _percentage(entry):
+        return (entry['completed'] / entry['total'] * 100) if entry['total'] > 0 else 0
     
     def toggle_checklist_item(self, checklist_id, item_id):
         """
-        切换清单项目的完成状态
+        切换清单项目的完成状态，并按增量更新所属课题和阶段的汇总（与清单大小无关）
         
         Args:
             checklist_id (int): 清单ID
             item_id (int): 项目ID
         """
         key = f"{checklist_id}_{item_id}"
-        current_progress = session_manager.get_checklist_progress()
-        current_state = current_progress.get(key, False)
+        aggregates = self._get_aggregates()
+        completed = not session_manager.get_checklist_progress().get(key, False)
         
         # 切换状态
-        session_manager.update_checklist_item(checklist_id, item_id, not current_state)
+        session_manager.update_checklist_item(checklist_id, item_id, completed)
         
-        # 更新整体进度
-        self.update_progress()
+        # 更新汇总及所属阶段的完成度
+        location = self.data_loader.get_item_location(checklist_id, item_id)
+        if location is None:
+            return
+        self._apply_delta(aggregates, location, checklist_id, item_id, 1 if completed else -1)
+        # 与全量重算一致：没有完成项目的阶段不记录完成度
+        stage_id = location[2]
+        stage_entry = aggregates['stages'][stage_id]
+        if stage_entry['completed']:
+            session_manager.update_stage_progress(stage_id, self._percentage(stage_entry))
+        else:
+            session_manager.remove_stage_progress(stage_id)
+        session_manager.update_total_score(aggregates['total_score'])
     
     def get_current_progress_stats(self):
         """
-        获取当前进度统计
+        获取当前进度统计（读取会话中的汇总）
         
         Returns:
             dict: 包含进度统计信息的字典
         """
         selected_topic = session_manager.get_selected_topic()
-        if not selected_topic:
+        entry = None
+        if selected_topic:
+            entry = self._get_aggregates()['topics'].get(selected_topic.id)
+        if not entry:
             return {
                 'total_items': 0,
                 'completed_items': 0,
@@ -77,28 +139,11 @@ class ProgressTracker:
                 'total_score': 0
             }
         
-        topic_id = selected_topic.get("id")
-        checklists = self.data_loader.get_checklists_by_topic(topic_id)
-        
-        total_items = 0
-        completed_items = 0
-        total_score = 0
-        
-        for checklist in checklists:
-            for item in checklist.get("items", []):
-                total_items += 1
-                item_id = f"{checklist['id']}_{item['id']}"
-                if session_manager.get_checklist_progress().get(item_id, False):
-                    completed_items += 1
-                    total_score += item.get("weight", 0) * 100
-        
-        completion_rate = (completed_items / total_items * 100) if total_items > 0 else 0
-        
         return {
-            'total_items': total_items,
-            'completed_items': completed_items,
-            'completion_rate': completion_rate,
-            'total_score': total_score
+            'total_items': entry['total'],
+            'completed_items': entry['completed'],
+            'completion_rate': self._percentage(entry),
+            'total_score': entry['score']
         }
     
     def get_stage_progress(self, stage_id):
@@ -147,16 +192,19 @@ class ProgressTracker:
                 'completed_topics': [],
                 'total_score': 0
             })
+            self.update_progress()
         elif topic_id is None:
             # 重置特定阶段的所有进度
             current_progress = session_manager.get_checklist_progress()
             new_progress = {}
             
             for key, value in current_progress.items():
-                # 只保留不属于该阶段的进度
-                checklist_id = int(key.split('_')[0])
-                checklist = self._get_checklist_by_id(checklist_id)
-                if checklist and checklist.get('topic_id') != topic_id:
+                # 只保留不属于该阶段的进度（无法解析的键一并清除）
+                parsed = self._parse_key(key)
+                if parsed is None:
+                    continue
+                location = self.data_loader.get_item_location(*parsed)
+                if location and location[2] != stage_id:
                     new_progress[key] = value
             
             session_manager.set_checklist_progress(new_progress)
@@ -167,9 +215,11 @@ class ProgressTracker:
             new_progress = {}
             
             for key, value in current_progress.items():
-                checklist_id = int(key.split('_')[0])
-                checklist = self._get_checklist_by_id(checklist_id)
-                if checklist and checklist.get('topic_id') != topic_id:
+                parsed = self._parse_key(key)
+                if parsed is None:
+                    continue
+                checklist = self._get_checklist_by_id(parsed[0])
+                if checklist and checklist.topic_id != topic_id:
                     new_progress[key] = value
             
             session_manager.set_checklist_progress(new_progress)
@@ -177,11 +227,7 @@ class ProgressTracker:
     
     def _get_checklist_by_id(self, checklist_id):
         """根据ID获取清单"""
-        all_checklists = self.data_loader.load_json("checklists.json").get("checklists", [])
-        for checklist in all_checklists:
-            if checklist.get("id") == checklist_id:
-                return checklist
-        return None
+        return self.data_loader.get_checklist_by_id(checklist_id)
     
     def export_progress(self):
         """
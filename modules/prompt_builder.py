@@ -0,0 +1,114 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# 研究进度评估的系统提示模板；阶段定义放在最后，之前的内容对所有请求逐字节相同
+EVALUATION_SYSTEM_TEMPLATE = """
+你是一个研究生学术指导助手，专门帮助学生评估论文进度、理解导师意图，并提供改进和沟通建议。
+请严格遵循以下规则：
+
+1. 根据学生提供的文本信息和图片（导师沟通记录）判断当前论文阶段：
+   - 开题阶段
+   - 中期阶段
+   - 结题阶段
+   - 答辩阶段
+
+2. 对当前阶段的各子任务（checklist）进行量化评估，用 0~1 的数字表示完成程度。
+   - 数字越接近1表示该子任务已完成得越充分，0表示尚未开始。
+   - 仅对当前阶段的 checklist 进行量化。
+
+3. 根据阶段和子任务进度，生成具体可操作的建议，帮助学生推进论文。
+
+4. 理解导师意思：
+   - 分析导师沟通记录或图片内容，提炼核心关注点和建议。
+   - 给出学生可执行的沟通策略。
+
+5. 输出必须严格按照 JSON 结构：
+{{
+  "current_stage": "开题阶段/中期阶段/结题阶段/答辩阶段",
+  "tasks_progress": {{
+    "子任务名称": 完成度(0~1),
+    ...
+  }},
+  "advice": "可操作建议文本",
+  "mentor_insights": "导师意见解读及沟通建议"
+}}
+
+6. 理解阶段及子任务信息如下：
+{stages_json}
+"""
+
+# 每类记忆化提示保留的条目上限
+_MAX_ENTRIES = 256
+
+
+class PromptBuilder:
+    """
+    提示词组装类
+    消息按 [静态系统提示][早期对话摘要][聊天历史][阶段/课题上下文][当前消息] 的顺序排列：
+    变化最少的部分放在最前面并保持逐字节相同，便于服务端的前缀缓存（DeepSeek、千问）
+    命中尽可能长的前缀；随页面变化的阶段/课题信息放在固定的靠后位置
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._system_messages: Dict[str, Dict[str, str]] = {}
+        self._context_messages: Dict[Tuple[str, str], Dict[str, str]] = {}
+        self._evaluation_prompts: Dict[str, str] = {}
+
+    def _memoize(self, cache: Dict, key: Any, build) -> Any:
+        """读取或生成记忆化条目，超过上限时清空重建"""
+        with self._lock:
+            value = cache.get(key)
+            if value is None:
+                if len(cache) >= _MAX_ENTRIES:
+                    cache.clear()
+                value = cache[key] = build()
+            return value
+
+    def system_message(self, system_prompt: str) -> Dict[str, str]:
+        """静态系统提示消息（不包含任何随会话变化的内容）"""
+        return self._memoize(self._system_messages, system_prompt,
+                             lambda: {"role": "system", "content": system_prompt})
+
+    def context_message(self, stage_name: str, topic_name: str) -> Dict[str, str]:
+        """当前阶段/课题的上下文消息，按 (阶段, 课题) 记忆化"""
+        return self._memoize(
+            self._context_messages, (stage_name, topic_name),
+            lambda: {"role": "system", "content": f"当前阶段：{stage_name}\n当前课题：{topic_name}"}
+        )
+
+    def chat_messages(self, system_prompt: str, user_message: str, history: List[Dict[str, Any]],
+                      summary: str = "", context: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        组装聊天请求的消息列表
+
+        Args:
+            system_prompt (str): 配置中的系统提示词
+            user_message (str): 当前用户消息
+            history (list): 预算内的聊天历史
+            summary (str): 早期对话摘要
+            context (dict): 上下文信息（阶段、课题等）
+
+        Returns:
+            list: 消息列表
+        """
+        messages = [self.system_message(system_prompt)]
+        if summary:
+            messages.append({
+                "role": "system",
+                "content": f"此前对话要点（较早的消息已省略）：\n{summary}"
+            })
+        messages.extend(history)
+        if context:
+            messages.append(self.context_message(context.get("stage_name", ""),
+                                                 context.get("topic_name", "")))
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def evaluation_system_prompt(self, stages_json: str) -> str:
+        """研究进度评估的系统提示，按阶段定义记忆化"""
+        return self._memoize(self._evaluation_prompts, stages_json,
+                             lambda: EVALUATION_SYSTEM_TEMPLATE.format(stages_json=stages_json))
+
+# 创建全局提示词构建器实例
+prompt_builder = PromptBuilder()
@@ -0,0 +1,296 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Mapping, NamedTuple, Optional, Tuple
+
+from modules.context_builder import estimate_tokens
+from modules.models import settings_from_config
+
+# 多模态消息中每张图片按固定 token 数估算
+_IMAGE_TOKENS = 1000
+# 排队者重新检查截止时间的最长间隔（秒）
+_POLL_INTERVAL = 1.0
+
+
+class RateLimitSettings(NamedTuple):
+    """单个 API 密钥的限流配置"""
+    enabled: bool = False
+    requests_per_minute: float = 60  # 0 表示不限制请求数
+    tokens_per_minute: float = 0     # 0 表示不限制 token 数
+    max_wait: float = 120            # 排队超过该时间（秒）后放弃
+    state_path: str = ""             # SQLite 文件路径，设置后多个进程共享配额
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "RateLimitSettings":
+        """根据配置文件中的 rate_limit 段构建"""
+        return settings_from_config(cls, config)
+
+
+class RateLimitTimeout(Exception):
+    """排队等待超过 max_wait"""
+
+
+def rate_limit_key(api_key: Optional[str], base_url: str) -> str:
+    """按 API 密钥和服务地址区分配额，不保存明文密钥"""
+    return hashlib.sha256(f"{base_url}\n{api_key or ''}".encode("utf-8")).hexdigest()[:32]
+
+
+def estimate_request_tokens(params: Mapping[str, Any]) -> int:
+    """
+    估算一次请求占用的 token 数：输入消息 + max_tokens
+
+    Args:
+        params (dict): chat.completions.create 的参数
+
+    Returns:
+        int: 估算的 token 数（响应返回 usage 后按实际值结算）
+    """
+    total = int(params.get("max_tokens") or 0)
+    for message in params.get("messages", ()):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            total += estimate_tokens(content)
+            continue
+        for part in content or ():
+            if part.get("type") == "text":
+                total += estimate_tokens(part.get("text", ""))
+            else:
+                total += _IMAGE_TOKENS
+    return total
+
+
+def _refill(levels: Tuple[float, float], updated_at: float, now: float,
+            settings: RateLimitSettings) -> Tuple[float, float]:
+    """按经过的时间补充两个令牌桶"""
+    elapsed = max(0.0, now - updated_at)
+    requests, tokens = levels
+    if settings.requests_per_minute > 0:
+        requests = min(settings.requests_per_minute,
+                       requests + elapsed * settings.requests_per_minute / 60)
+    if settings.tokens_per_minute > 0:
+        tokens = min(settings.tokens_per_minute,
+                     tokens + elapsed * settings.tokens_per_minute / 60)
+    return requests, tokens
+
+
+def _take(levels: Tuple[float, float], cost: float,
+          settings: RateLimitSettings) -> Tuple[Tuple[float, float], float]:
+    """
+    尝试从令牌桶中取出一次请求和 cost 个 token
+
+    Returns:
+        tuple: (取出后的令牌数, 还需等待的秒数；0 表示已取出)
+    """
+    requests, tokens = levels
+    # 单次请求超过桶容量时按容量计算，否则永远无法放行
+    cost = min(cost, settings.tokens_per_minute)
+    wait = 0.0
+    if settings.requests_per_minute > 0 and requests < 1:
+        wait = max(wait, (1 - requests) * 60 / settings.requests_per_minute)
+    if settings.tokens_per_minute > 0 and tokens < cost:
+        wait = max(wait, (cost - tokens) * 60 / settings.tokens_per_minute)
+    if wait > 0:
+        return levels, wait
+    return (requests - 1, tokens - cost), 0.0
+
+
+class _SQLiteBucketStore:
+    """跨进程共享的令牌桶状态"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 多个配额键共用同一个连接，由 _lock 串行化访问
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                requests REAL NOT NULL,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def update(self, key: str, settings: RateLimitSettings,
+               change: Callable[[Tuple[float, float]], Tuple[Tuple[float, float], Any]]) -> Any:
+        """在一个写事务中读取、补充并修改令牌桶"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute("SELECT requests, tokens, updated_at FROM rate_limits WHERE key = ?",
+                                         (key,)).fetchone()
+                if row is None:
+                    levels = (settings.requests_per_minute, settings.tokens_per_minute)
+                else:
+                    levels = _refill((row[0], row[1]), row[2], now, settings)
+                levels, result = change(levels)
+                self._conn.execute("INSERT OR REPLACE INTO rate_limits (key, requests, tokens, updated_at) "
+                                   "VALUES (?, ?, ?, ?)", (key, levels[0], levels[1], now))
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+class RateLimiter:
+    """
+    按 API 密钥共享的令牌桶限流器
+    - 请求数和 token 数各一个令牌桶，按每分钟配额匀速补充
+    - 同一密钥的请求按到达顺序排队（FIFO），只有队首可以取令牌，避免大请求被饿死
+    - 配置 state_path 后令牌桶状态保存在 SQLite 中，多个进程共享同一份配额
+    - 每个密钥有独立的锁和条件变量，某个密钥的状态文件读写缓慢时不影响其他密钥
+    """
+
+    def __init__(self):
+        # 只保护下面几个字典的增删，不在持有时做任何等待或 I/O
+        self._lock = threading.Lock()
+        self._conds: Dict[str, threading.Condition] = {}
+        self._queues: Dict[str, deque] = {}
+        # 进程内令牌桶：key -> ((请求令牌, token 令牌), 更新时间)
+        self._buckets: Dict[str, Tuple[Tuple[float, float], float]] = {}
+        self._stores: Dict[str, _SQLiteBucketStore] = {}
+
+    def _key_state(self, key: str) -> Tuple[threading.Condition, deque]:
+        """获取密钥的条件变量和排队队列"""
+        with self._lock:
+            cond = self._conds.get(key)
+            if cond is None:
+                cond = self._conds[key] = threading.Condition()
+                self._queues[key] = deque()
+            return cond, self._queues[key]
+
+    def _store(self, path: str) -> _SQLiteBucketStore:
+        """获取状态文件对应的共享存储（在 _lock 之外打开文件）"""
+        store = self._stores.get(path)
+        if store is None:
+            store = _SQLiteBucketStore(path)
+            with self._lock:
+                store = self._stores.setdefault(path, store)
+        return store
+
+    def _update(self, key: str, settings: RateLimitSettings, change) -> Any:
+        """读取、补充并修改令牌桶（调用方持有该密钥的条件变量）"""
+        if settings.state_path:
+            try:
+                store = self._store(settings.state_path)
+                return store.update(key, settings, change)
+            except sqlite3.Error as e:
+                # 共享状态不可用时退回进程内限流
+                print(f"限流状态读写失败: {e}")
+
+        now = time.time()
+        cached = self._buckets.get(key)
+        if cached is None:
+            levels = (settings.requests_per_minute, settings.tokens_per_minute)
+        else:
+            levels = _refill(cached[0], cached[1], now, settings)
+        levels, result = change(levels)
+        self._buckets[key] = (levels, now)
+        return result
+
+    def acquire(self, key: str, tokens: int, settings: RateLimitSettings,
+                on_wait: Optional[Callable[[int, float], None]] = None):
+        """
+        排队等待配额，取到令牌后返回
+
+        Args:
+            key (str): 配额键（见 rate_limit_key）
+            tokens (int): 本次请求预计占用的 token 数
+            settings (RateLimitSettings): 限流配置
+            on_wait (callable): 需要排队时以 (排队位置, 已等待秒数) 调用，位置从 1 开始
+
+        Raises:
+            RateLimitTimeout: 等待超过 settings.max_wait
+        """
+        if not settings.enabled:
+            return
+
+        ticket = object()
+        started = time.monotonic()
+        last_position = None
+        last_notified = 0.0
+        cond, queue = self._key_state(key)
+        with cond:
+            queue.append(ticket)
+
+        try:
+            while True:
+                notify = None
+                with cond:
+                    position = queue.index(ticket) + 1
+                    wait = _POLL_INTERVAL
+                    if position == 1:
+                        wait = self._update(key, settings, lambda levels: _take(levels, tokens, settings))
+                        if wait <= 0:
+                            queue.popleft()
+                            cond.notify_all()
+                            return
+
+                    waited = time.monotonic() - started
+                    if waited >= settings.max_wait:
+                        raise RateLimitTimeout(f"请求排队超过 {settings.max_wait:.0f} 秒")
+                    if position != last_position or waited - last_notified >= _POLL_INTERVAL:
+                        # 位置变化或每隔一段时间回调一次（在锁外执行），再继续等待
+                        notify = (position, waited)
+                        last_position = position
+                        last_notified = waited
+                    else:
+                        cond.wait(min(wait, _POLL_INTERVAL - (waited - last_notified),
+                                            settings.max_wait - waited))
+
+                if notify is not None and on_wait is not None:
+                    on_wait(*notify)
+        except BaseException:
+            with cond:
+                if ticket in queue:
+                    queue.remove(ticket)
+                    cond.notify_all()
+            raise
+
+    def try_acquire(self, key: str, tokens: int, settings: RateLimitSettings) -> bool:
+        """
+        不排队地尝试取得配额，用于对冲请求等可以放弃的额外请求
+
+        Returns:
+            bool: 没有其他请求排队且令牌充足时取出令牌并返回 True，否则返回 False
+        """
+        if not settings.enabled:
+            return True
+        cond, queue = self._key_state(key)
+        with cond:
+            if queue:
+                return False
+            return self._update(key, settings, lambda levels: _take(levels, tokens, settings)) <= 0
+
+    def settle(self, key: str, estimated: int, actual: int, settings: RateLimitSettings):
+        """请求完成后按实际 token 用量结算，多扣的 token 退回令牌桶"""
+        if not settings.enabled or settings.tokens_per_minute <= 0 or actual >= estimated:
+            return
+        refund = min(estimated, settings.tokens_per_minute) - actual
+        if refund <= 0:
+            return
+
+        def give_back(levels):
+            requests, tokens = levels
+            return (requests, min(settings.tokens_per_minute, tokens + refund)), None
+
+        cond, _ = self._key_state(key)
+        with cond:
+            self._update(key, settings, give_back)
+            cond.notify_all()
+
+    def queue_length(self, key: str) -> int:
+        """当前排队的请求数"""
+        with self._lock:
+            return len(self._queues.get(key, ()))
+
+# 创建全局限流器实例（进程内所有会话共享）
+rate_limiter = RateLimiter()
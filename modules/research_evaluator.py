@@ -1,162 +1,275 @@
 import streamlit as st
-from openai import OpenAI
+import hashlib
 import os
 import json
+import threading
+import time
 from dotenv import load_dotenv
+from modules.data_loader import data_loader, thaw
+from modules.image_pipeline import ImageProcessingError, ImageSettings, image_pipeline
+from modules.job_queue import JOB_DONE, JOB_FAILED, JobSettings, job_queue
+from modules.json_extract import extract_json, validate_evaluation
+from modules.json_stream import IncrementalJSONParser
+from modules.llm_runtime import llm_runtime, ProviderConfig
+from modules.metrics import metrics
+from modules.prompt_builder import prompt_builder
+from modules.response_cache import CacheSettings, ResponseCacheFactory, make_cache_key
+from modules.session_manager import session_manager
 
 # 加载环境变量
 load_dotenv()
 
+# 命中缓存的评估结果中记录原评估时间（时间戳）的字段
+CACHED_AT_KEY = "cached_at"
+# 评估结果中记录最终使用的思考档位的字段
+TIER_KEY = "thinking_tier"
+# 评估结果中记录解析时自动修正内容的字段
+WARNINGS_KEY = "parse_warnings"
+# 思考档位，从低到高；结果不可用时按此顺序升级
+THINKING_TIERS = ("fast", "standard", "deep")
+TIER_LABELS = {"fast": "快速", "standard": "标准", "deep": "深度"}
+# 各档位的默认参数（可在 evaluator_config.json 的 thinking.tiers 中覆盖）
+DEFAULT_TIER_PARAMS = {
+    "fast": {"enable_thinking": False},
+    "standard": {"enable_thinking": True, "thinking_budget": 4096},
+    "deep": {"enable_thinking": True, "thinking_budget": 81920},
+}
+# 提交评估任务后等待结果的时间（秒），缓存命中等很快结束的任务不必等到下一次轮询
+_SUBMIT_WAIT_SECONDS = 0.3
+# 实时思考过程显示的最大字符数
+_THINKING_MAX_CHARS = 3000
+
+
+class _LiveEvaluationView:
+    """评估进行中的实时展示：模型的思考过程，以及按字段逐个出现的评估结果"""
+    
+    def __init__(self, container, show_thinking=True):
+        """
+        Args:
+            container: 展示区域
+            show_thinking (bool): 是否显示思考过程
+        """
+        self.show_thinking = show_thinking
+        self._thinking = ""
+        with container:
+            self._thinking_slot = st.empty()
+            self._stage_slot = st.empty()
+            self._tasks = st.container()
+            self._advice_slot = st.empty()
+            self._mentor_slot = st.empty()
+        self._thinking_area = None
+        self._has_tasks = False
+    
+    def on_thinking(self, text):
+        """追加并显示思考内容（只显示最后一部分）"""
+        if not self.show_thinking:
+            return
+        self._thinking += text
+        if self._thinking_area is None:
+            self._thinking_area = self._thinking_slot.expander("🧠 思考过程", expanded=True).empty()
+        shown = self._thinking[-_THINKING_MAX_CHARS:]
+        if len(shown) < len(self._thinking):
+            shown = "…" + shown
+        self._thinking_area.caption(shown)
+    
+    def on_field(self, path, value):
+        """显示一个已完整解析的结果字段"""
+        if path == ("current_stage",):
+            self._stage_slot.markdown(f"#### 📍 当前阶段: **{value}**")
+        elif len(path) == 2 and path[0] == "tasks_progress" and isinstance(value, (int, float)):
+            progress = min(max(float(value), 0.0), 1.0)
+            with self._tasks:
+                if not self._has_tasks:
+                    self._has_tasks = True
+                    st.markdown("#### 📈 任务完成度")
+                st.markdown(f"**{path[1]}**")
+                st.progress(progress, text=f"{int(progress * 100)}%")
+        elif path == ("advice",) and value:
+            self._advice_slot.info(f"💡 {value}")
+        elif path == ("mentor_insights",) and value:
+            self._mentor_slot.warning(f"👨‍🏫 {value}")
+
 class ResearchEvaluator:
     """研究生论文进度评估类，使用千问API分析研究进度"""
     
     def __init__(self):
-        # 初始化千问客户端
-        self.client = OpenAI(
-            api_key=os.getenv("QWEN_API_KEY", "sk-90224d784fa94a06a5acedd7e152848d"),
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
+        self.data_loader = data_loader
+        # 千问 API 密钥；客户端由共享的异步运行时按配置创建
+        self.api_key = os.getenv("QWEN_API_KEY", "sk-90224d784fa94a06a5acedd7e152848d")
+        
+        # 评估提示中的阶段定义（assets/evaluation_stages.json），按阶段名缓存紧凑序列化结果
+        self._stages_source = None
+        self._stages_json = {}
+        self._lock = threading.Lock()
+        # 评估结果缓存（按配置创建）
+        self._result_cache = ResponseCacheFactory("evaluation", CacheSettings(
+            path=".cache/evaluations.sqlite3", memory_entries=128, ttl_seconds=604800, max_disk_entries=2000))
+    
+    def stage_names(self):
+        """评估配置中的阶段名称列表"""
+        return [stage.get("stage", "") for stage in self.data_loader.get_evaluation_stages()]
+    
+    def stages_json(self, stage=None):
+        """
+        生成评估提示中的阶段定义：紧凑 JSON（无缩进和多余空白），每个进程只序列化一次，
+        配置文件重新加载后重新生成
+        
+        Args:
+            stage (str): 只包含该阶段的任务清单；为空或不存在时包含全部阶段
+        
+        Returns:
+            str: 阶段定义 JSON
+        """
+        stages = self.data_loader.get_evaluation_stages()
+        with self._lock:
+            if stages is not self._stages_source:
+                self._stages_source = stages
+                self._stages_json = {}
+            selected = [item for item in stages if item.get("stage") == stage] if stage else []
+            key = stage if selected else None
+            cached = self._stages_json.get(key)
+            if cached is None:
+                # 关键词只用于本地阶段判断，不发送给模型
+                prompt_stages = [{name: thaw(value) for name, value in item.items() if name != "keywords"}
+                                 for item in selected or stages]
+                cached = self._stages_json[key] = json.dumps(
+                    {"stages": prompt_stages}, ensure_ascii=False, separators=(",", ":")
+                )
+            return cached
+    
+    def guess_stage(self, user_text):
+        """
+        按各阶段的关键词在本地粗略判断所处阶段
+        
+        Returns:
+            tuple: (得分最高的阶段名称，无任何关键词命中时为 None; 区分度 0~1，
+                    为 (最高分 - 次高分) / 最高分，越小越难判断)
+        """
+        text = user_text.lower()
+        scores = sorted(
+            ((sum(text.count(keyword.lower()) for keyword in item.get("keywords", ())), item.get("stage"))
+             for item in self.data_loader.get_evaluation_stages()),
+            key=lambda pair: pair[0], reverse=True
         )
+        if not scores or scores[0][0] == 0:
+            return None, 0.0
+        runner_up = scores[1][0] if len(scores) > 1 else 0
+        return scores[0][1], (scores[0][0] - runner_up) / scores[0][0]
+    
+    def select_tier(self, user_text, image_url=None, stage=None, thinking_config=None):
+        """
+        选择思考档位：描述越长、附带图片、本地阶段判断越不确定，需要的推理越多
+        
+        Args:
+            user_text (str): 研究进度描述
+            image_url (str): 图片（可选）
+            stage (str): 用户选择的阶段（已选择时不再判断阶段）
+            thinking_config (dict): 配置中的 thinking 段；mode 不是 auto 时直接使用该档位
+        
+        Returns:
+            str: fast / standard / deep
+        """
+        thinking_config = thinking_config or {}
+        mode = thinking_config.get("mode", "auto")
+        if mode in THINKING_TIERS:
+            return mode
+        
+        score = 0
+        length = len(user_text.strip())
+        if length > thinking_config.get("long_text_chars", 600):
+            score += 2
+        elif length > thinking_config.get("short_text_chars", 150):
+            score += 1
+        if image_url:
+            score += 1
+        if not stage:
+            _, margin = self.guess_stage(user_text)
+            if margin < thinking_config.get("min_stage_margin", 0.34):
+                score += 1
+        if score == 0:
+            return "fast"
+        return "standard" if score <= 2 else "deep"
+    
+    def _stream_evaluation(self, provider_config, params, on_wait=None, on_field=None, on_thinking=None):
+        """
+        流式评估：增量解析模型输出，每个字段的值完整时以 (路径, 值) 调用 on_field，
+        思考内容（reasoning_content）逐段传给 on_thinking
+        
+        Returns:
+            tuple: (完整输出文本, 解析结果；输出不是完整 JSON 时为 None)
+        """
+        parser = IncrementalJSONParser()
+        for chunk in llm_runtime.stream("qwen", provider_config, on_wait=on_wait, **params):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            thinking = getattr(delta, "reasoning_content", None)
+            if thinking and on_thinking is not None:
+                on_thinking(thinking)
+            if delta.content:
+                for path, value in parser.feed(delta.content):
+                    if on_field is not None:
+                        on_field(path, value)
+        return parser.text, parser.result
+    
+    def _tier_params(self, thinking_config, tier):
+        """档位对应的请求参数（enable_thinking / thinking_budget）"""
+        params = dict(DEFAULT_TIER_PARAMS[tier])
+        params.update(thinking_config.get("tiers", {}).get(tier, {}))
+        if not params.get("enable_thinking"):
+            params.pop("thinking_budget", None)
+        return params
+    
+    def _request_evaluation(self, provider_config, evaluator_config, params, on_wait=None, on_field=None,
+                            on_thinking=None):
+        """
+        发送一次评估请求并解析结果
+        输出中的代码块标记、前后说明文字和常见格式问题会被自动处理，结果按评估结构校验并规范化
+        （阶段和子任务名称对应到阶段定义，进度限制在 0~1）
+        
+        Returns:
+            tuple: (评估结果，失败时包含 error，无法提取 JSON 时另含 raw_output;
+                    结果是否可用，见 validate_evaluation)
+        """
+        try:
+            if evaluator_config.get("stream", True):
+                content, result = self._stream_evaluation(provider_config, params, on_wait, on_field, on_thinking)
+            else:
+                completion = llm_runtime.complete("qwen", provider_config, on_wait=on_wait, stream=False, **params)
+                content, result = completion.choices[0].message.content, None
+            
+        except Exception as e:
+            return {"error": f"API调用失败: {str(e)}"}, False
         
-        # 阶段定义JSON
-        self.stages_json = """{
-          "stages": [
-            {
-              "stage": "开题阶段",
-              "purpose": "判断是否已经完成选题、立题与研究方案设计，可正式进入研究阶段",
-              "checklist": {
-                "选题阶段（Topic Selection）": [
-                  "已在专业/导师方向范围内确定选题领域（例如机器人、AI、控制等）",
-                  "能说明选题的现实背景或科学意义（why this topic matters）",
-                  "已阅读至少10篇核心文献，了解主流方向与最新成果",
-                  "能明确当前研究空缺或痛点（what's missing）",
-                  "选题难度、创新性、资源需求均在可承受范围内（not too easy / not too ambitious）",
-                  "导师认可该题目具备研究/应用价值（达到'可以写开题报告'标准）"
-                ],
-                "立题与问题定义（Problem Definition）": [
-                  "能用1-2句话清晰表述研究问题（research question / hypothesis）",
-                  "研究目标明确且可量化（例如'提升x性能''降低y误差''验证z假设'）",
-                  "知道研究要解决的问题类型（理论、算法、实验、工程应用等）",
-                  "能解释'为什么是你来做'（已有基础、资源或兴趣匹配）"
-                ],
-                "研究方案设计（Method Design）": [
-                  "已确定主要研究方法（实验/建模/仿真/数据分析/系统实现等）",
-                  "已识别关键变量、控制因素与评估指标（metrics）",
-                  "初步确定数据来源 / 硬件设备 / 软件工具 / 算力平台等",
-                  "形成初步研究路线图（包含模块划分或任务分解）",
-                  "明确预期成果形式（论文、系统、算法、专利、调研报告等）"
-                ],
-                "可行性与时间规划（Feasibility & Schedule）": [
-                  "已制定阶段性时间表（含关键里程碑和交付物）",
-                  "已评估风险点（如实验失败、数据不足、计算资源问题等）并提出应对方案",
-                  "导师对计划认可且建议方向可行",
-                  "准备了开题报告初稿和汇报材料（含研究背景、意义、方法、计划）"
-                ]
-              }
-            },
-            {
-              "stage": "中期阶段",
-              "purpose": "判断是否核心研究工作已经实质推进，有中期成果",
-              "checklist": {
-                "研究进展": [
-                  "核心算法/系统/实验平台已搭建完毕并能正常运行",
-                  "已有第一批实验结果或系统功能可展示",
-                  "遇到的主要问题已被识别（数据、参数、收敛、硬件等）"
-                ],
-                "路径与节奏": [
-                  "明确后续优化方向（例如模型调优、特征改进、方法对比）",
-                  "能展示阶段性成果图表/视频/结果",
-                  "保持每周或双周例会更新进展"
-                ],
-                "风险与调整": [
-                  "已评估当前计划能否如期完成，如有必要已调整方向或目标",
-                  "导师对当前进度总体满意，未出现长期停滞"
-                ]
-              }
-            },
-            {
-              "stage": "结题阶段",
-              "purpose": "判断是否进入收尾与论文写作阶段",
-              "checklist": {
-                "研究结果完善": [
-                  "核心实验完成 ≥80%，主要数据和对比实验齐全",
-                  "研究结果可复现并支持主要结论",
-                  "研究贡献点已形成闭环（从问题→方法→结果→验证）"
-                ],
-                "论文撰写": [
-                  "论文大纲已确定，introduction 与 method 部分初稿完成",
-                  "已有主要图表与实验对比结果",
-                  "已梳理related work并明确自己相对他人的创新点"
-                ],
-                "收尾准备": [
-                  "准备结题报告、成果展示或演示视频",
-                  "导师已审阅论文初稿并反馈修改意见",
-                  "准备论文查重、投稿或归档材料"
-                ]
-              }
-            },
-            {
-              "stage": "答辩阶段",
-              "purpose": "判断是否具备自信展示与答辩的准备度",
-              "checklist": {
-                "展示准备": [
-                  "答辩PPT已完成（结构清晰：背景→问题→方法→结果→贡献）",
-                  "已进行至少一次模拟答辩，熟悉时间控制与节奏",
-                  "能清晰讲述研究动机、方法逻辑、结果意义"
-                ],
-                "问答应对": [
-                  "准备了常见答辩问题：创新点、方法细节、局限性、未来方向",
-                  "能冷静应对质疑和延伸性问题",
-                  "能把技术内容讲给非本领域听众理解"
-                ],
-                "后续收尾": [
-                  "根据评委意见完成论文最终修改",
-                  "归档所有成果：论文、代码、实验记录、PPT、视频等",
-                  "准备成果展示或申报（例如优秀毕业论文、竞赛、专利等）"
-                ]
-              }
-            }
-          ]
-        }"""
+        data = result if isinstance(result, dict) else extract_json(content)
+        if not isinstance(data, dict):
+            return {"raw_output": content, "error": "JSON解析失败"}, False
+        result, issues, usable = validate_evaluation(data, self.data_loader.get_evaluation_stages())
+        if issues:
+            result[WARNINGS_KEY] = issues
+        return result, usable
     
-    def evaluate_research_progress(self, user_text, image_url=None, enable_thinking=True):
+    def evaluate_research_progress(self, user_text, image_url=None, tier=None, on_wait=None,
+                                   stage=None, use_cache=True, on_field=None, on_thinking=None, on_tier=None):
         """
         调用千问 qwen3-vl-plus，分析研究生论文阶段、任务进度、建议、导师意图。
         返回 JSON dict: current_stage, tasks_progress, advice, mentor_insights
+        on_wait 在限流排队时以 (排队位置, 已等待秒数) 调用
+        stage 为阶段名称时提示中只包含该阶段的任务清单
+        
+        配置 stream 开启（默认）时以流式方式调用：on_field 在每个字段解析完成时以 (路径, 值) 调用，
+        例如 ("current_stage",)、("tasks_progress", 子任务名)；on_thinking 逐段接收思考内容
+        
+        tier 为思考档位（fast 不思考 / standard / deep），为空时按输入自动选择（见 select_tier），
+        自动选择时结果 JSON 格式错误或不可信会升级到更高档位重新评估；明确指定的档位不升级。
+        每次开始请求时以档位调用 on_tier，结果中的 thinking_tier 为最终使用的档位
+        
+        相同输入（文本、图片内容、模型、起始档位、阶段定义）的成功结果会被缓存，
+        命中时直接返回，结果中的 cached_at 为原评估时间；use_cache=False 时跳过缓存重新评估
         """
-        system_prompt = f"""
-你是一个研究生学术指导助手，专门帮助学生评估论文进度、理解导师意图，并提供改进和沟通建议。
-请严格遵循以下规则：
-
-1. 根据学生提供的文本信息和图片（导师沟通记录）判断当前论文阶段：
-   - 开题阶段
-   - 中期阶段
-   - 结题阶段
-   - 答辩阶段
-
-2. 对当前阶段的各子任务（checklist）进行量化评估，用 0~1 的数字表示完成程度。
-   - 数字越接近1表示该子任务已完成得越充分，0表示尚未开始。
-   - 仅对当前阶段的 checklist 进行量化。
-
-3. 根据阶段和子任务进度，生成具体可操作的建议，帮助学生推进论文。
-
-4. 理解导师意思：
-   - 分析导师沟通记录或图片内容，提炼核心关注点和建议。
-   - 给出学生可执行的沟通策略。
-
-5. 输出必须严格按照 JSON 结构：
-{{
-  "current_stage": "开题阶段/中期阶段/结题阶段/答辩阶段",
-  "tasks_progress": {{
-    "子任务名称": 完成度(0~1),
-    ...
-  }},
-  "advice": "可操作建议文本",
-  "mentor_insights": "导师意见解读及沟通建议"
-}}
-
-6. 理解阶段及子任务信息如下：
-{self.stages_json}
-"""
+        started = time.perf_counter()
+        # 系统提示按阶段定义只生成一次，各次评估的请求前缀逐字节相同
+        system_prompt = prompt_builder.evaluation_system_prompt(self.stages_json(stage))
 
         messages = [{"role": "system", "content": system_prompt}]
 
@@ -166,23 +279,69 @@ class ResearchEvaluator:
 
         messages.append({"role": "user", "content": user_content})
 
-        try:
-            completion = self.client.chat.completions.create(
-                model="qwen3-vl-plus",
-                messages=messages,
-                stream=False,
-                extra_body={"enable_thinking": enable_thinking, "thinking_budget": 81920}
+        evaluator_config = self.data_loader.get_evaluator_config().get("evaluator", {})
+        model = evaluator_config.get("model_name", "qwen3-vl-plus")
+        thinking_config = evaluator_config.get("thinking", {})
+        if tier and tier not in THINKING_TIERS:
+            raise ValueError(f"未知的思考档位: {tier}（可选 {' / '.join(THINKING_TIERS)}）")
+        # 只有自动选择的档位会在结果不可用时升级
+        escalate = not tier and thinking_config.get("escalate", True)
+        tier = tier or self.select_tier(user_text, image_url, stage, thinking_config)
+
+        cache = self._result_cache.get(evaluator_config.get("result_cache"))
+        cache_key = None
+        if cache is not None:
+            # 图片按内容哈希参与计算；系统提示包含阶段定义，定义变化后旧结果自然失效
+            cache_key = make_cache_key(
+                user_text=user_text,
+                image=hashlib.sha256(image_url.encode("utf-8")).hexdigest() if image_url else "",
+                model=model,
+                tier=tier,
+                thinking=self._tier_params(thinking_config, tier),
+                schema=hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
             )
+            cached = cache.get(cache_key) if use_cache else None
+            if cached is not None:
+                metrics.observe("evaluation_seconds", time.perf_counter() - started, outcome="cache", tier=tier)
+                return dict(cached["result"], **{CACHED_AT_KEY: cached["created_at"]})
 
-            content = completion.choices[0].message.content
-            try:
-                result = json.loads(content)
-            except json.JSONDecodeError:
-                result = {"raw_output": content, "error": "JSON解析失败"}
-                
-        except Exception as e:
-            result = {"error": f"API调用失败: {str(e)}"}
+        provider_config = ProviderConfig.from_pool_config(
+            self.api_key,
+            # 环境变量 QWEN_BASE_URL 优先（例如指向本地模拟服务）
+            os.getenv("QWEN_BASE_URL") or evaluator_config.get("base_url", "https://dashscope.aliyuncs.com/compatible-mode/v1"),
+            evaluator_config.get("connection_pool", {}),
+            evaluator_config.get("resilience", {}),
+            evaluator_config.get("rate_limit", {})
+        )
+
+        while True:
+            if on_tier is not None:
+                on_tier(tier)
+            result, usable = self._request_evaluation(provider_config, evaluator_config, {
+                "model": model,
+                "messages": messages,
+                "extra_body": self._tier_params(thinking_config, tier)
+            }, on_wait, on_field, on_thinking)
+            if usable:
+                outcome = "ok"
+            elif "error" not in result:
+                outcome = "low_confidence"
+            else:
+                outcome = "parse_error" if "raw_output" in result else "api_error"
+            
+            # 无法解析或不可用的结果升级到更高档位；可用的部分结果直接采用，接口错误已由重试处理
+            position = THINKING_TIERS.index(tier)
+            if not escalate or outcome in ("ok", "api_error") or position + 1 >= len(THINKING_TIERS):
+                break
+            metrics.inc("evaluation_escalations_total", from_tier=tier, reason=outcome)
+            tier = THINKING_TIERS[position + 1]
         
+        if outcome != "api_error":
+            result[TIER_KEY] = tier
+        metrics.observe("evaluation_seconds", time.perf_counter() - started, outcome=outcome, tier=tier)
+        if cache is not None and outcome == "ok":
+            # 只缓存可用的结果
+            cache.put(cache_key, {"result": result, "created_at": time.time()})
         return result
     
     def show_evaluation_interface(self):
@@ -207,22 +366,145 @@ class ResearchEvaluator:
         
         image_url = None
         if uploaded_file is not None:
-            # 在实际应用中，这里需要将文件上传到图床并获取URL
-            # 目前先显示预览
             st.image(uploaded_file, caption="上传的图片", use_column_width=True)
-            st.info("图片上传功能需要配置图床服务，目前仅作预览")
+            # 本地裁剪、缩小并压缩为 data URL 随请求发送，同一张图片只处理一次
+            evaluator_config = self.data_loader.get_evaluator_config().get("evaluator", {})
+            try:
+                processed = image_pipeline.process(uploaded_file.getvalue(),
+                                                   ImageSettings.from_config(evaluator_config.get("image", {})))
+                image_url = processed.data_url
+                st.caption(f"已压缩：{processed.original_bytes / 1024:.0f} KB → {processed.encoded_bytes / 1024:.0f} KB"
+                           f"（{processed.width}×{processed.height}）")
+            except ImageProcessingError as e:
+                st.error(str(e))
+        
+        # 所处阶段（可选），选择后提示中只包含该阶段的任务清单
+        auto_option = "自动判断"
+        selected_stage = st.selectbox(
+            "当前所处阶段（可选）",
+            [auto_option] + self.stage_names(),
+            help="选择后只按该阶段的任务清单评估，分析更快"
+        )
+        stage = None if selected_stage == auto_option else selected_stage
+        
+        # 评估模式：自动按描述长度、是否有图片和阶段是否明确选择思考档位
+        tier_options = [None] + list(THINKING_TIERS)
+        tier = st.radio(
+            "评估模式",
+            tier_options,
+            format_func=lambda option: "自动" if option is None else TIER_LABELS[option],
+            horizontal=True,
+            help="快速模式不进行深度思考，几秒内返回；深度模式分析更充分但耗时较长。自动模式下结果不可用时会自动升级"
+        )
         
-        # 评估按钮
-        if st.button("🔍 智能评估研究进度", use_container_width=True):
+        # 评估按钮（已有评估进行中时禁用）
+        pending = session_manager.get_evaluation_job()
+        if st.button("🔍 智能评估研究进度", use_container_width=True, disabled=pending is not None):
             if not user_text.strip():
                 st.error("请输入您的研究进度描述")
                 return
+            pending = self._start_evaluation({"user_text": user_text, "image_url": image_url, "stage": stage,
+                                              "tier": tier})
+        
+        # 评估在后台执行，页面重新运行或切换页面后继续轮询结果
+        if pending is not None:
+            self._show_evaluation_job()
+            return
+        
+        # 显示最近一次评估结果（页面重新运行后保留）
+        evaluation = session_manager.get_evaluation_result()
+        if not evaluation:
+            return
+        result = evaluation["result"]
+        if CACHED_AT_KEY in result:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                cached_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(result[CACHED_AT_KEY]))
+                st.caption(f"⚡ 缓存结果（评估于 {cached_at}），输入相同未重新调用模型")
+            with col2:
+                if st.button("🔄 重新评估", use_container_width=True):
+                    self._start_evaluation(evaluation["inputs"], use_cache=False)
+                    st.rerun()
+        
+        # 显示评估结果
+        self._display_evaluation_result(result)
+    
+    def _job_settings(self):
+        """后台评估任务配置"""
+        return JobSettings.from_config(self.data_loader.get_evaluator_config().get("evaluator", {}).get("jobs", {}))
+    
+    def _start_evaluation(self, inputs, use_cache=True):
+        """
+        提交后台评估任务，任务 ID 保存在会话状态中
+        
+        Args:
+            inputs (dict): 评估输入（user_text, image_url, stage, tier）
+            use_cache (bool): 是否使用缓存结果
+        
+        Returns:
+            dict: 会话中保存的任务信息 {"job_id", "inputs"}
+        """
+        def run(job):
+            # 在线程池中执行，不访问 Streamlit；排队位置、已解析的字段和思考内容写入任务进度
+            return self.evaluate_research_progress(
+                inputs["user_text"], inputs["image_url"], tier=inputs.get("tier"), stage=inputs["stage"],
+                use_cache=use_cache,
+                on_wait=lambda position, waited: job.set_progress(queue=(position, waited)),
+                on_field=lambda path, value: job.append_progress("fields", (path, value)),
+                on_thinking=lambda text: job.append_progress("thinking", text),
+                # 升级档位时清空上一次请求的部分结果
+                on_tier=lambda current: job.set_progress(tier=current, fields=[], thinking=[])
+            )
+        
+        job = job_queue.submit("evaluation", run, self._job_settings())
+        job.wait(_SUBMIT_WAIT_SECONDS)
+        pending = {"job_id": job.id, "inputs": inputs}
+        session_manager.set_evaluation_job(pending)
+        return pending
+    
+    def _show_evaluation_job(self):
+        """按配置的间隔轮询后台评估任务（只重新运行该区域），结束后保存结果并刷新页面"""
+        settings = self._job_settings()
+        
+        @st.fragment(run_every=settings.poll_interval)
+        def poll():
+            pending = session_manager.get_evaluation_job()
+            if pending is None:
+                return
+            job = job_queue.get(pending["job_id"], settings)
+            if job is None:
+                # 任务已过期或服务已重启
+                session_manager.set_evaluation_job(None)
+                st.warning("评估任务已失效，请重新评估")
+                return
             
-            with st.spinner("正在分析您的研究进度..."):
-                result = self.evaluate_research_progress(user_text, image_url)
+            snapshot = job.snapshot()
+            if snapshot["status"] in (JOB_DONE, JOB_FAILED):
+                result = snapshot["result"]
+                if snapshot["status"] == JOB_FAILED or not isinstance(result, dict):
+                    result = {"error": f"评估任务失败: {snapshot['error']}"}
+                session_manager.set_evaluation_result({"inputs": pending["inputs"], "result": result})
+                session_manager.set_evaluation_job(None)
+                st.rerun()
             
-            # 显示评估结果
-            self._display_evaluation_result(result)
+            progress = snapshot["progress"]
+            queue = progress.get("queue")
+            if queue and not progress.get("fields") and not progress.get("thinking"):
+                st.info(f"当前使用人数较多，正在排队（第 {queue[0]} 位，已等待 {int(queue[1])} 秒）...")
+            else:
+                mode = TIER_LABELS.get(progress.get("tier"), "")
+                st.info(f"⏳ 正在以{mode}模式分析您的研究进度（已用时 {int(snapshot['elapsed'])} 秒），"
+                        f"可以离开本页面，结果会保留...")
+            
+            # 按已收到的进度重建实时展示
+            evaluator_config = self.data_loader.get_evaluator_config().get("evaluator", {})
+            view = _LiveEvaluationView(st.container(), show_thinking=evaluator_config.get("show_thinking", True))
+            if progress.get("thinking"):
+                view.on_thinking("".join(progress["thinking"]))
+            for path, value in progress.get("fields", ()):
+                view.on_field(path, value)
+        
+        poll()
     
     def _display_evaluation_result(self, result):
         """
@@ -237,6 +519,12 @@ class ResearchEvaluator:
         # 显示当前阶段
         current_stage = result.get("current_stage", "未知阶段")
         st.markdown(f"#### 📍 当前阶段: **{current_stage}**")
+        if result.get(TIER_KEY) in TIER_LABELS:
+            st.caption(f"评估模式：{TIER_LABELS[result[TIER_KEY]]}")
+        if result.get(WARNINGS_KEY):
+            with st.expander("⚠️ 模型输出已自动修正"):
+                for warning in result[WARNINGS_KEY]:
+                    st.caption(warning)
         
         # 显示任务进度
         tasks_progress = result.get("tasks_progress", {})
@@ -262,7 +550,8 @@ class ResearchEvaluator:
         
         # 显示原始JSON（调试用）
         with st.expander("📋 查看详细数据"):
-            st.json(result)
+            st.json({key: value for key, value in result.items()
+                     if key not in (CACHED_AT_KEY, TIER_KEY, WARNINGS_KEY)})
 
 # 创建全局评估器实例
 research_evaluator = ResearchEvaluator()
\ No newline at end of file
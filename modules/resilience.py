@@ -0,0 +1,241 @@
+import asyncio
+import datetime
+import email.utils
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional
+
+from openai import APIConnectionError, APIStatusError
+
+from modules.metrics import metrics
+from modules.models import settings_from_config
+
+
+class ResiliencePolicy(NamedTuple):
+    """重试、熔断与对冲请求策略"""
+    max_attempts: int = 3          # 含首次请求在内的最大尝试次数
+    base_delay: float = 0.5        # 指数退避的初始间隔（秒）
+    max_delay: float = 8.0         # 单次退避的最大间隔（秒）
+    max_retry_after: float = 30.0  # 服务端 Retry-After 的最大采纳值（秒）
+    failure_threshold: int = 5     # 连续失败多少次后熔断
+    recovery_timeout: float = 30.0 # 熔断后多久允许一次探测请求（秒）
+    hedge: bool = False            # 是否启用对冲请求（对冲请求同样占用限流配额，配额不足时不对冲）
+    hedge_min_delay: float = 1.0   # 对冲延迟的下限（秒）
+    hedge_min_samples: int = 20    # 至少积累多少次耗时样本后才启用对冲
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "ResiliencePolicy":
+        """根据配置文件中的 resilience 段构建"""
+        return settings_from_config(cls, config)
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        计算第 attempt 次重试前的等待时间
+
+        Args:
+            attempt (int): 已失败的次数（从 1 开始）
+            retry_after (float): 服务端要求的等待时间
+
+        Returns:
+            float: 等待秒数
+        """
+        if retry_after is not None:
+            return min(max(retry_after, 0.0), self.max_retry_after)
+        # full jitter：在 [0, 上限] 内均匀取值，避免大量会话同时重试
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+
+class CircuitBreaker:
+    """
+    单个服务端点的熔断器
+    连续出现 failure_threshold 次可重试故障后打开，recovery_timeout 后放行一次探测请求，
+    探测成功则关闭，失败则重新计时
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self, policy: ResiliencePolicy):
+        """请求前检查，熔断期间抛出 CircuitOpenError"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < policy.recovery_timeout or self._probing:
+                raise CircuitOpenError(f"{self.name} 服务暂时不可用（已熔断）")
+            # 半开状态：只放行一个探测请求
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self, policy: ResiliencePolicy):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= policy.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self):
+        """探测请求被取消时释放半开状态"""
+        with self._lock:
+            self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+
+class LatencyWindow:
+    """最近请求耗时的滚动窗口，用于估算对冲请求的触发延迟"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def hedge_delay(self, policy: ResiliencePolicy) -> Optional[float]:
+        """样本充足时返回 p95 耗时（不低于下限），否则返回 None 表示不对冲"""
+        if not policy.hedge or len(self._samples) < policy.hedge_min_samples:
+            return None
+        return max(policy.hedge_min_delay, self.percentile(0.95))
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """判断是否为可重试的临时故障：408、409（冲突）、429、5xx、超时和连接错误"""
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return isinstance(error, (APIConnectionError, asyncio.TimeoutError))
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """读取响应头中的 Retry-After（秒数或 HTTP 日期），缺失或无法解析时返回 None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError, OverflowError):
+        # 格式错误时按普通退避处理
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp() - time.time()
+
+
+async def call_with_resilience(call: Callable[[], Awaitable[Any]], policy: ResiliencePolicy,
+                               breaker: CircuitBreaker, latency: LatencyWindow,
+                               hedge_allowed: Optional[Callable[[], Awaitable[bool]]] = None) -> Any:
+    """
+    以重试、熔断和（可选）对冲请求的方式执行异步调用
+
+    Args:
+        call: 每次调用返回一个新的协程
+        policy (ResiliencePolicy): 策略
+        breaker (CircuitBreaker): 端点熔断器
+        latency (LatencyWindow): 端点耗时窗口
+        hedge_allowed: 发出对冲请求前调用（例如取得限流配额），返回 False 时不对冲
+
+    Returns:
+        调用结果
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        breaker.before_call(policy)
+        try:
+            result = await _hedged(call, latency, latency.hedge_delay(policy), hedge_allowed)
+        except Exception as e:
+            if not is_transient_error(e):
+                # 请求本身有误（例如 400/401），端点是可达的
+                breaker.record_success()
+                raise
+            breaker.record_failure(policy)
+            if attempt >= policy.max_attempts or breaker.is_open:
+                raise
+            metrics.inc("llm_retries_total", endpoint=breaker.name)
+            await asyncio.sleep(policy.backoff(attempt, retry_after_seconds(e)))
+            continue
+        except BaseException:
+            breaker.release_probe()
+            raise
+        breaker.record_success()
+        return result
+
+
+async def _hedged(call: Callable[[], Awaitable[Any]], latency: LatencyWindow,
+                  hedge_delay: Optional[float],
+                  hedge_allowed: Optional[Callable[[], Awaitable[bool]]] = None) -> Any:
+    """
+    执行一次调用；超过 hedge_delay 仍未返回且 hedge_allowed 允许时并行发起第二个请求，取先成功者
+    调用方被取消时取消所有未完成的请求
+    """
+
+    async def timed():
+        started = time.monotonic()
+        result = await call()
+        latency.observe(time.monotonic() - started)
+        return result
+
+    primary = asyncio.ensure_future(timed())
+    if hedge_delay is None:
+        return await primary
+
+    pending = {primary}
+    error = None
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+        if done:
+            return primary.result()
+        if hedge_allowed is None or await hedge_allowed():
+            pending.add(asyncio.ensure_future(timed()))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+
+from modules.metrics import metrics
+from modules.models import settings_from_config
+
+
+def _normalize(value: Any) -> Any:
+    """规范化参与缓存键计算的数据：统一换行、去除首尾空白"""
+    if isinstance(value, str):
+        return value.replace("\r\n", "\n").strip()
+    if isinstance(value, dict) or hasattr(value, "items"):
+        return {str(key): _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def make_cache_key(**parts) -> str:
+    """
+    根据请求各组成部分计算缓存键
+
+    Returns:
+        str: 规范化 JSON 的 sha256
+    """
+    payload = json.dumps(_normalize(parts), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    两级响应缓存
+    - 内存层：进程内 LRU
+    - 磁盘层：SQLite，按 TTL 过期，超过条目上限时淘汰最久未访问的条目
+    值以 JSON 保存，可缓存文本或字典
+    """
+
+    def __init__(self, path: str, namespace: str = "default", memory_entries: int = 256,
+                 ttl_seconds: float = 86400, max_disk_entries: int = 5000):
+        self.path = path
+        self.namespace = namespace
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程复用一个 SQLite 连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        读取缓存
+
+        Returns:
+            缓存的值，未命中或已过期时返回 None
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                expires_at, value = cached
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, expires_at FROM responses WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+                if row is None or row[1] <= now:
+                    if row is not None:
+                        conn.execute("DELETE FROM responses WHERE namespace = ? AND key = ?",
+                                     (self.namespace, key))
+                    self._count("misses")
+                    return None
+                conn.execute("UPDATE responses SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                             (now, self.namespace, key))
+        except sqlite3.Error as e:
+            print(f"响应缓存读取失败: {e}")
+            self._count("misses")
+            return None
+
+        value = json.loads(row[0])
+        self._remember(key, row[1], value)
+        self._count("disk_hits")
+        return value
+
+    def put(self, key: str, value: Any):
+        """写入缓存（内存层和磁盘层）"""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        self._remember(key, expires_at, value)
+        self._count("writes")
+
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (namespace, key, value, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(value, ensure_ascii=False), expires_at, now)
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            print(f"响应缓存写入失败: {e}")
+
+    def invalidate(self, key: str):
+        """删除指定缓存条目"""
+        with self._lock:
+            self._memory.pop(key, None)
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM responses WHERE namespace = ? AND key = ?", (self.namespace, key))
+        except sqlite3.Error as e:
+            print(f"响应缓存删除失败: {e}")
+
+    def _remember(self, key: str, expires_at: float, value: Any):
+        """写入内存层并按 LRU 淘汰"""
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """删除过期条目，并在超过上限时淘汰最久未访问的条目"""
+        conn.execute("DELETE FROM responses WHERE namespace = ? AND expires_at <= ?", (self.namespace, now))
+        (count,) = conn.execute("SELECT COUNT(*) FROM responses WHERE namespace = ?",
+                                (self.namespace,)).fetchone()
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE namespace = ? AND key IN ("
+                "SELECT key FROM responses WHERE namespace = ? ORDER BY accessed_at LIMIT ?)",
+                (self.namespace, self.namespace, overflow)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """获取命中统计"""
+        with self._lock:
+            return dict(self._stats)
+
+
+class CacheSettings(NamedTuple):
+    """响应缓存配置（配置文件中的 response_cache / result_cache 段）"""
+    enabled: bool = False
+    path: str = ".cache/responses.sqlite3"
+    memory_entries: int = 256
+    ttl_seconds: float = 86400
+    max_disk_entries: int = 5000
+
+
+class ResponseCacheFactory:
+    """
+    按配置段创建并持有某个命名空间的响应缓存
+    配置变化（例如热更新）时重新创建，并以 <namespace>_cache_* 导出命中统计
+    """
+
+    def __init__(self, namespace: str, defaults: CacheSettings = CacheSettings()):
+        self.namespace = namespace
+        self.defaults = defaults
+        self._cache: Optional[ResponseCache] = None
+        self._settings: Optional[CacheSettings] = None
+        self._lock = threading.Lock()
+
+    def get(self, config: Optional[Mapping[str, Any]]) -> Optional[ResponseCache]:
+        """
+        获取缓存实例
+
+        Args:
+            config (dict): 配置文件中的缓存段
+
+        Returns:
+            ResponseCache: 缓存实例，未启用时返回 None
+        """
+        settings = settings_from_config(CacheSettings, config, self.defaults)
+        if not settings.enabled:
+            return None
+
+        with self._lock:
+            if self._cache is None or self._settings != settings:
+                cache = ResponseCache(settings.path, namespace=self.namespace,
+                                      memory_entries=settings.memory_entries,
+                                      ttl_seconds=settings.ttl_seconds,
+                                      max_disk_entries=settings.max_disk_entries)
+                self._cache = cache
+                self._settings = settings
+                metrics.register_collector(f"{self.namespace}_cache", lambda: {
+                    f"{self.namespace}_cache_{name}": value for name, value in cache.stats().items()
+                })
+            return self._cache
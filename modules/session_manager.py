@@ -93,6 +93,43 @@ class SessionManager:
         else:
             st.session_state.chat_history.append({"role": role, "content": content})
     
+    def get_chat_summary(self, stage_id=None):
+        """获取早期聊天记录的滚动摘要"""
+        if stage_id:
+            return st.session_state.get(f"chat_summary_{stage_id}")
+        return st.session_state.get('chat_summary')
+    
+    def set_chat_summary(self, summary, stage_id=None):
+        """设置早期聊天记录的滚动摘要"""
+        if stage_id:
+            st.session_state[f"chat_summary_{stage_id}"] = summary
+        else:
+            st.session_state.chat_summary = summary
+    
+    def set_chat_error(self, message, stage_id=None):
+        """记录聊天请求失败信息，在下一次渲染聊天界面时显示"""
+        st.session_state[f"chat_error_{stage_id}" if stage_id else 'chat_error'] = message
+    
+    def pop_chat_error(self, stage_id=None):
+        """取出并清除待显示的聊天请求失败信息，没有时返回 None"""
+        return st.session_state.pop(f"chat_error_{stage_id}" if stage_id else 'chat_error', None)
+    
+    def get_evaluation_result(self):
+        """获取最近一次研究进度评估（结果及评估输入）"""
+        return st.session_state.get('evaluation_result')
+    
+    def set_evaluation_result(self, evaluation):
+        """设置最近一次研究进度评估"""
+        st.session_state.evaluation_result = evaluation
+    
+    def get_evaluation_job(self):
+        """获取进行中的后台评估任务（任务 ID 及评估输入）"""
+        return st.session_state.get('evaluation_job')
+    
+    def set_evaluation_job(self, job):
+        """设置进行中的后台评估任务，None 表示没有"""
+        st.session_state.evaluation_job = job
+    
     def get_checklist_progress(self):
         """获取清单进度"""
         return st.session_state.get('checklist_progress', {})
@@ -106,6 +143,14 @@ class SessionManager:
         key = f"{checklist_id}_{item_id}"
         st.session_state.checklist_progress[key] = completed
     
+    def get_progress_aggregates(self):
+        """获取按课题和阶段汇总的清单进度（完成数、加权得分），未计算时返回 None"""
+        return st.session_state.get('progress_aggregates')
+    
+    def set_progress_aggregates(self, aggregates):
+        """设置按课题和阶段汇总的清单进度"""
+        st.session_state.progress_aggregates = aggregates
+    
     def get_user_progress(self):
         """获取用户进度"""
         return st.session_state.get('user_progress', {
@@ -125,6 +170,10 @@ class SessionManager:
             st.session_state.user_progress['stage_progress'] = {}
         st.session_state.user_progress['stage_progress'][stage_id] = progress_percentage
     
+    def remove_stage_progress(self, stage_id):
+        """移除阶段进度（该阶段没有已完成的项目）"""
+        st.session_state.user_progress.get('stage_progress', {}).pop(stage_id, None)
+    
     def update_total_score(self, score):
         """更新总得分"""
         st.session_state.user_progress['total_score'] = score
@@ -133,12 +182,13 @@ class SessionManager:
         """清空会话状态（重置应用）"""
         keys_to_clear = [
             'current_page', 'selected_stage', 'selected_topic', 
-            'chat_history', 'checklist_progress', 'user_progress'
+            'chat_history', 'checklist_progress', 'progress_aggregates', 'user_progress',
+            'evaluation_result', 'evaluation_job'
         ]
         
-        # 清除所有聊天历史（包括按阶段的）
+        # 清除所有聊天历史及摘要（包括按阶段的）
         for key in list(st.session_state.keys()):
-            if key.startswith('chat_history_'):
+            if key.startswith(('chat_history_', 'chat_summary', 'chat_error')):
                 del st.session_state[key]
         
         # 清除主要状态
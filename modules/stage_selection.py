@@ -2,6 +2,7 @@ import streamlit as st
 from modules.data_loader import data_loader
 from modules.session_manager import session_manager
 from modules.config import PAGE_MAIN_INTERFACE
+from modules.models import Stage
 
 class StageSelection:
     """阶段选择页面模块"""
@@ -27,11 +28,11 @@ class StageSelection:
             with cols[idx]:
                 self._render_stage_card(stage)
     
-    def _render_stage_card(self, stage: dict):
+    def _render_stage_card(self, stage: Stage):
         """渲染单个阶段卡片"""
         # 获取阶段颜色，如果没有则使用默认颜色
-        stage_color = stage.get('color', '#6C757D')
-        stage_id = stage.get('id')
+        stage_color = stage.color or '#6C757D'
+        stage_id = stage.id
         
         # 创建自定义按钮样式 - 为每个阶段创建唯一的CSS类
         button_style = f"""
@@ -66,14 +67,14 @@ class StageSelection:
         st.markdown(button_style, unsafe_allow_html=True)
         
         # 创建按钮内容 - 使用纯文本格式
-        button_label = f"{stage.get('icon', '📝')}\n\n{stage.get('name', '阶段')}\n\n{stage.get('description', '')}"
+        button_label = f"{stage.icon or '📝'}\n\n{stage.name or '阶段'}\n\n{stage.description}"
         
         # 创建可直接点击的大框
         if st.button(
             button_label,
             key=f"stage_{stage_id}",
             use_container_width=True,
-            help=f"点击进入 {stage.get('name')} 阶段"
+            help=f"点击进入 {stage.name} 阶段"
         ):
             # 保存选择的阶段到session state
             session_manager.set_selected_stage(stage)
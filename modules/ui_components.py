@@ -2,6 +2,8 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 from modules.data_loader import data_loader
+from modules.metrics import metrics
+from modules.models import Topic
 from modules.session_manager import session_manager
 from modules.progress_tracker import progress_tracker
 from modules.api_client import api_client
@@ -10,6 +12,9 @@ from modules.research_evaluator import research_evaluator
 # 加载环境变量
 load_dotenv()
 
+# 研究进度评估入口使用的虚拟课题（不对应任何清单）
+RESEARCH_EVALUATION_TOPIC = Topic(id=None, name="研究进度评估")
+
 class UIComponents:
     """UI 组件管理类，负责渲染各种用户界面组件"""
     
@@ -26,25 +31,26 @@ class UIComponents:
             st.info("请先选择一个课题")
             return
         
-        topic_id = selected_topic.get("id")
+        topic_id = selected_topic.id
         checklists = self.data_loader.get_checklists_by_topic(topic_id)
+        checklist_progress = session_manager.get_checklist_progress()
         
         for checklist in checklists:
-            st.markdown(f"**{checklist.get('name', '清单')}**")
+            st.markdown(f"**{checklist.name or '清单'}**")
             
-            for item in checklist.get("items", []):
-                item_id = f"{checklist['id']}_{item['id']}"
-                is_completed = session_manager.get_checklist_progress().get(item_id, False)
+            for item in checklist.items:
+                item_id = f"{checklist.id}_{item.id}"
+                is_completed = checklist_progress.get(item_id, False)
                 
-                checkbox_label = f"{item.get('description', '')} (权重: {item.get('weight', 0)})"
+                checkbox_label = f"{item.description} (权重: {item.weight})"
                 
                 if st.checkbox(checkbox_label, value=is_completed, 
                              key=f"check_{item_id}"):
                     if not is_completed:
-                        progress_tracker.toggle_checklist_item(checklist['id'], item['id'])
+                        progress_tracker.toggle_checklist_item(checklist.id, item.id)
                 else:
                     if is_completed:
-                        progress_tracker.toggle_checklist_item(checklist['id'], item['id'])
+                        progress_tracker.toggle_checklist_item(checklist.id, item.id)
     
     def show_chat_interface(self, stage_id=None):
         """
@@ -73,18 +79,12 @@ class UIComponents:
             chat_history = session_manager.get_chat_history(stage_id)
             
             for message in chat_history:
-                if message["role"] == "user":
-                    st.markdown(f"""
-                    <div class="chat-message user-message">
-                        <strong>你:</strong> {message["content"]}
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(f"""
-                    <div class="chat-message ai-message">
-                        <strong>AI助手:</strong> {message["content"]}
-                    </div>
-                    """, unsafe_allow_html=True)
+                self._render_chat_message(st, message["role"], message["content"])
+            
+            # 上一次请求失败（如流式回答中断）的提示，显示一次后清除
+            chat_error = session_manager.pop_chat_error(stage_id)
+            if chat_error:
+                st.error(chat_error)
         
         # 输入区域
         st.markdown("---")
@@ -96,11 +96,37 @@ class UIComponents:
         with col1:
             if st.button(chat_config.get("send_button", "发送"), use_container_width=True, key=f"send_btn{stage_suffix}"):
                 if user_input.strip():
-                    success, response = api_client.send_message(user_input, stage_id)
+                    # 在聊天区域末尾逐步渲染生成中的回答
+                    with chat_container:
+                        self._render_chat_message(st, "user", user_input)
+                        reply_placeholder = st.empty()
+                    self._render_chat_message(reply_placeholder, "assistant",
+                                              chat_config.get("thinking", "思考中..."))
+                    
+                    partial = []
+                    
+                    def on_token(text):
+                        partial[:] = [text]
+                        self._render_chat_message(reply_placeholder, "assistant", text + "▌")
+                    
+                    def on_wait(position, waited):
+                        queued = chat_config.get("queued", "正在排队（第 {position} 位）...")
+                        self._render_chat_message(reply_placeholder, "assistant",
+                                                  queued.format(position=position, waited=int(waited)))
+                    
+                    success, response = api_client.send_message(user_input, stage_id,
+                                                                on_token=on_token, on_wait=on_wait)
                     if success:
                         st.rerun()
                     else:
+                        # 不重新运行页面：保留已收到的部分回答并标明中断，它不会写入聊天历史
+                        if partial:
+                            self._render_chat_message(reply_placeholder, "assistant",
+                                                      partial[0] + chat_config.get("interrupted", "（回答中断）"))
+                        else:
+                            reply_placeholder.empty()
                         st.error(response)
+                        session_manager.set_chat_error(response, stage_id)
                 else:
                     st.error("请输入消息内容")
         
@@ -109,6 +135,28 @@ class UIComponents:
                 api_client.clear_chat_history(stage_id)
                 st.rerun()
     
+    def _render_chat_message(self, target, role, content):
+        """
+        渲染单条聊天消息
+        
+        Args:
+            target: 渲染目标（st 或 st.empty() 占位符）
+            role (str): 消息角色 user/assistant
+            content (str): 消息内容
+        """
+        if role == "user":
+            target.markdown(f"""
+            <div class="chat-message user-message">
+                <strong>你:</strong> {content}
+            </div>
+            """, unsafe_allow_html=True)
+        else:
+            target.markdown(f"""
+            <div class="chat-message ai-message">
+                <strong>AI助手:</strong> {content}
+            </div>
+            """, unsafe_allow_html=True)
+    
     def show_function_panel(self, stage_id=None):
         """
         显示右侧功能面板
@@ -136,7 +184,7 @@ class UIComponents:
         
         # 添加研究进度评估按钮
         if st.button("🔍 研究进度评估", key=f"research_eval{stage_suffix}", use_container_width=True):
-            session_manager.set_selected_topic({"name": "研究进度评估"})
+            session_manager.set_selected_topic(RESEARCH_EVALUATION_TOPIC)
             st.rerun()
         
         for func in functions:
@@ -173,11 +221,11 @@ class UIComponents:
         with st.expander(f"📚 {sidebar_config.get('topic_selection', '课题选择')}", expanded=True):
             selected_stage = session_manager.get_selected_stage()
             if selected_stage:
-                stage_id = selected_stage.get("id")
+                stage_id = selected_stage.id
                 topics = self.data_loader.get_topics_by_stage(stage_id)
                 
                 for topic in topics:
-                    if st.button(f"{topic.get('name')}", key=f"topic_{topic.get('id')}", use_container_width=True):
+                    if st.button(f"{topic.name}", key=f"topic_{topic.id}", use_container_width=True):
                         session_manager.set_selected_topic(topic)
                         st.rerun()
         
@@ -262,15 +310,18 @@ class UIComponents:
         
         # 检查是否显示研究进度评估界面
         selected_topic = session_manager.get_selected_topic()
-        if selected_topic and selected_topic.get("name") == "研究进度评估":
+        if selected_topic and selected_topic.name == RESEARCH_EVALUATION_TOPIC.name:
             self.show_research_evaluation_interface()
             return
         
         # 创建四个阶段的标签页
         stages = self.data_loader.get_stages()
-        tab_names = [f"{stage.get('icon', '🎓')} {stage.get('name', '')}" for stage in stages]
+        tab_names = [f"{stage.icon or '🎓'} {stage.name}" for stage in stages]
         
         tabs = st.tabs(tab_names)
+        # 各标签页渲染时临时切换当前阶段，渲染完成后恢复，
+        # 否则下一次运行时侧边栏显示的是最后一个标签页阶段的课题，点击的课题按钮会失效
+        selected_stage = session_manager.get_selected_stage()
         
         for i, tab in enumerate(tabs):
             with tab:
@@ -279,19 +330,22 @@ class UIComponents:
                 session_manager.set_selected_stage(current_stage)
                 
                 # 显示该阶段的界面
-                st.title(f"{current_stage.get('icon', '🎓')} {current_stage.get('name', '')}")
+                st.title(f"{current_stage.icon or '🎓'} {current_stage.name}")
                 
                 # 显示阶段描述
-                st.info(current_stage.get('description', ''))
+                st.info(current_stage.description)
                 
                 # 主界面布局
                 col1, col2 = st.columns([2, 1])
                 
                 with col1:
-                    self.show_chat_interface(stage_id=current_stage.get("id"))
+                    self.show_chat_interface(stage_id=current_stage.id)
                 
                 with col2:
-                    self.show_function_panel(stage_id=current_stage.get("id"))
+                    self.show_function_panel(stage_id=current_stage.id)
+        
+        if selected_stage is not None:
+            session_manager.set_selected_stage(selected_stage)
     
     def show_research_evaluation_interface(self):
         """
@@ -309,5 +363,58 @@ class UIComponents:
         # 显示研究评估界面
         research_evaluator.show_evaluation_interface()
 
+    def show_metrics_dashboard(self):
+        """
+        显示运行指标页面（仅管理员可见）
+        包含接口耗时、首字延迟、token 用量、配置加载和页面渲染等指标
+        """
+        st.title("📈 运行指标")
+        st.caption("分位数基于最近 10 分钟内的样本，次数和总和为进程启动以来的累计值")
+        
+        if st.button("🔄 刷新", use_container_width=True):
+            st.rerun()
+        
+        snapshot = metrics.snapshot()
+        
+        st.markdown("### ⏱️ 耗时与大小")
+        histogram_rows = []
+        for histogram in snapshot["histograms"]:
+            # 以秒为单位的指标换算为毫秒显示
+            scale, unit = (1000, "ms") if histogram["name"].endswith("_seconds") else (1, "")
+            histogram_rows.append({
+                "指标": histogram["name"],
+                "标签": ", ".join(f"{name}={value}" for name, value in histogram["labels"].items()),
+                "次数": histogram["count"],
+                "单位": unit,
+                "均值": round(histogram["mean"] * scale, 1),
+                "p50": round(histogram["p50"] * scale, 1),
+                "p95": round(histogram["p95"] * scale, 1),
+                "p99": round(histogram["p99"] * scale, 1),
+            })
+        if histogram_rows:
+            st.dataframe(histogram_rows, use_container_width=True, hide_index=True)
+        else:
+            st.info("暂无数据")
+        
+        st.markdown("### 🔢 计数")
+        counter_rows = [{
+            "指标": counter["name"],
+            "标签": ", ".join(f"{name}={value}" for name, value in counter["labels"].items()),
+            "值": counter["value"],
+        } for counter in snapshot["counters"]]
+        counter_rows += [{"指标": name, "标签": "", "值": value} for name, value in snapshot["gauges"].items()]
+        if counter_rows:
+            st.dataframe(counter_rows, use_container_width=True, hide_index=True)
+        else:
+            st.info("暂无数据")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("下载 Prometheus 文本", metrics.to_prometheus(), file_name="metrics.txt",
+                               use_container_width=True)
+        with col2:
+            st.download_button("下载 JSON", metrics.to_json(), file_name="metrics.json",
+                               use_container_width=True)
+
 # 创建全局 UI 组件实例
 ui_components = UIComponents()
\ No newline at end of file
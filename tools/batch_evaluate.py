@@ -0,0 +1,338 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from tools.mock_llm_server import MockLLMServer, add_settings_arguments, settings_from_args
+
+# 批量研究进度评估：逐行读取 JSONL 记录，以有限并发调用 ResearchEvaluator，
+# 每完成一条立即追加写入结果 JSONL（同时作为断点，中断后以相同参数重新运行会跳过已成功的记录），
+# 可选同时写出 Parquet。相同输入只评估一次：批内重复的记录共用同一次评估，跨批次由评估结果缓存去重
+#
+# 输入记录：{"id": "可选，缺省为行号", "user_text": "...", "image_path": "可选，相对输入文件所在目录",
+#            "stage": "可选，阶段名称", "tier": "可选，fast / standard / deep"}
+# 输出记录：{"id", "status": "ok" | "error", "result", "error", "cached", "seconds", "evaluated_at"}
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+# 思考档位（与 research_evaluator.THINKING_TIERS 一致；评估模块在设置环境变量后才导入）
+_TIERS = ("fast", "standard", "deep")
+
+# 同时在途（已读取、未写出）的记录数上限为并发数的倍数，输入文件不会被整体读入内存
+_INFLIGHT_FACTOR = 2
+# Parquet 的列；tasks_progress、unmatched_tasks 与 parse_warnings 以 JSON 文本保存
+_PARQUET_COLUMNS = ("id", "status", "current_stage", "tasks_progress", "unmatched_tasks", "advice",
+                    "mentor_insights", "thinking_tier", "parse_warnings", "cached", "error", "seconds",
+                    "evaluated_at")
+
+
+def read_records(path: str) -> Iterator[Tuple[str, Any]]:
+    """
+    逐行读取输入 JSONL
+
+    Yields:
+        tuple: (记录 ID, 记录)；无法解析的行记录为错误说明字符串
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield str(line_number), f"第 {line_number} 行不是有效的 JSON: {e}"
+                continue
+            if not isinstance(record, dict) or not str(record.get("user_text") or "").strip():
+                yield str(line_number), f"第 {line_number} 行缺少 user_text"
+                continue
+            if record.get("tier") and record["tier"] not in _TIERS:
+                yield (str(record.get("id", line_number)),
+                       f"第 {line_number} 行的 tier 无效: {record['tier']}（可选 {' / '.join(_TIERS)}）")
+                continue
+            yield str(record.get("id", line_number)), record
+
+
+def load_checkpoint(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    读取已有的结果 JSONL，同一 ID 以最后一条为准
+
+    Returns:
+        dict: {记录 ID: 已成功的结果行}
+    """
+    done: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                # 上次中断时写了一半的行
+                continue
+            if row.get("status") == STATUS_OK:
+                done[str(row.get("id"))] = row
+            else:
+                done.pop(str(row.get("id")), None)
+    return done
+
+
+class ParquetSink:
+    """
+    按批写出 Parquet：每累积 batch_size 行写一个 row group，结束时写入文件尾
+    Parquet 文件无法追加，恢复运行时先写入断点中已成功的行，再继续写入新结果
+    """
+
+    def __init__(self, path: str, batch_size: int):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise SystemExit(f"写入 Parquet 需要安装 pyarrow: {e}")
+        self._pa = pa
+        self._schema = pa.schema([
+            ("id", pa.string()), ("status", pa.string()), ("current_stage", pa.string()),
+            ("tasks_progress", pa.string()), ("unmatched_tasks", pa.string()), ("advice", pa.string()),
+            ("mentor_insights", pa.string()), ("thinking_tier", pa.string()), ("parse_warnings", pa.string()),
+            ("cached", pa.bool_()), ("error", pa.string()), ("seconds", pa.float64()),
+            ("evaluated_at", pa.float64()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._batch_size = max(1, batch_size)
+        self._rows: List[Dict[str, Any]] = []
+
+    @staticmethod
+    def _flatten(row: Dict[str, Any]) -> Dict[str, Any]:
+        result = row.get("result") or {}
+        return {
+            "id": row.get("id"),
+            "status": row.get("status"),
+            "current_stage": result.get("current_stage"),
+            "tasks_progress": json.dumps(result.get("tasks_progress", {}), ensure_ascii=False),
+            "unmatched_tasks": json.dumps(result.get("unmatched_tasks", {}), ensure_ascii=False),
+            "advice": result.get("advice"),
+            "mentor_insights": result.get("mentor_insights"),
+            "thinking_tier": result.get("thinking_tier"),
+            "parse_warnings": json.dumps(result.get("parse_warnings", []), ensure_ascii=False),
+            "cached": bool(row.get("cached")),
+            "error": row.get("error"),
+            "seconds": float(row.get("seconds") or 0.0),
+            "evaluated_at": float(row.get("evaluated_at") or 0.0),
+        }
+
+    def write(self, row: Dict[str, Any]):
+        self._rows.append(self._flatten(row))
+        if len(self._rows) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            columns = {name: [row[name] for row in self._rows] for name in _PARQUET_COLUMNS}
+            self._writer.write_table(self._pa.table(columns, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+class BatchEvaluator:
+    """批量评估：读取图片、批内去重、在线程池中调用评估并按完成顺序写出结果"""
+
+    def __init__(self, evaluator, args: argparse.Namespace):
+        from modules.image_pipeline import ImageSettings
+
+        self.evaluator = evaluator
+        self.args = args
+        self.base_dir = os.path.dirname(os.path.abspath(args.input))
+        evaluator_config = evaluator.data_loader.get_evaluator_config().get("evaluator", {})
+        self.image_settings = ImageSettings.from_config(evaluator_config.get("image", {}))
+        self.counts = {"ok": 0, "error": 0, "skipped": 0, "deduplicated": 0, "cached": 0}
+
+    def _load_image(self, record: Dict[str, Any]) -> Optional[bytes]:
+        """读取记录中的图片文件内容，没有图片时返回 None"""
+        image_path = record.get("image_path")
+        if not image_path:
+            return None
+        with open(os.path.join(self.base_dir, image_path), "rb") as f:
+            return f.read()
+
+    def _dedupe_key(self, record: Dict[str, Any], image: Optional[bytes]) -> str:
+        """批内去重的键：文本、图片内容、阶段、档位都相同的记录只评估一次"""
+        parts = [record["user_text"], hashlib.sha256(image).hexdigest() if image else "",
+                 record.get("stage") or self.args.stage or "", record.get("tier") or self.args.tier or ""]
+        return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _evaluate(self, record: Dict[str, Any], image: Optional[bytes]) -> Dict[str, Any]:
+        """在工作线程中评估一条记录，返回不含 ID 的结果行"""
+        from modules.image_pipeline import ImageProcessingError, image_pipeline
+        from modules.research_evaluator import CACHED_AT_KEY
+
+        started = time.perf_counter()
+        try:
+            image_url = image_pipeline.process(image, self.image_settings).data_url if image else None
+            result = self.evaluator.evaluate_research_progress(
+                record["user_text"],
+                image_url=image_url,
+                tier=record.get("tier") or self.args.tier,
+                stage=record.get("stage") or self.args.stage,
+                use_cache=not self.args.no_cache
+            )
+        except ImageProcessingError as e:
+            result = {"error": str(e)}
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        error = result.get("error")
+        return {
+            "status": STATUS_ERROR if error else STATUS_OK,
+            "result": None if error else result,
+            "error": error,
+            "cached": CACHED_AT_KEY in result,
+            "seconds": round(time.perf_counter() - started, 3),
+            "evaluated_at": time.time(),
+        }
+
+    def run(self, done: Dict[str, Dict[str, Any]], output, parquet: Optional[ParquetSink]):
+        """
+        执行批量评估
+
+        Args:
+            done (dict): 断点中已成功的结果行，对应的记录跳过
+            output: 结果 JSONL 文件（追加模式）
+            parquet (ParquetSink): Parquet 输出，可为空
+        """
+        if parquet is not None:
+            for row in done.values():
+                parquet.write(row)
+
+        def emit(row: Dict[str, Any]):
+            output.write(json.dumps(row, ensure_ascii=False) + "\n")
+            output.flush()
+            if parquet is not None:
+                parquet.write(row)
+            self.counts[row["status"]] += 1
+            self.counts["cached"] += bool(row.get("cached"))
+            finished = self.counts["ok"] + self.counts["error"]
+            detail = row["error"] or (row["result"] or {}).get("current_stage", "")
+            print(f"[{finished}] {row['id']} {row['status']} {row['seconds']:.1f}s {detail}", flush=True)
+
+        # 在途的评估：{去重键: Future}，以及每个 Future 对应的记录 ID
+        pending: Dict[str, Future] = {}
+        waiting: Dict[Future, List[str]] = {}
+        seen: Set[str] = set()
+        limit = max(1, self.args.concurrency) * _INFLIGHT_FACTOR
+
+        def collect(block: bool):
+            completed, _ = wait(list(waiting), return_when=FIRST_COMPLETED, timeout=None if block else 0)
+            for future in completed:
+                row = future.result()
+                for record_id in waiting.pop(future):
+                    emit(dict({"id": record_id}, **row))
+            for key in [key for key, future in pending.items() if future in completed]:
+                del pending[key]
+
+        with ThreadPoolExecutor(max_workers=max(1, self.args.concurrency), thread_name_prefix="batch") as executor:
+            for count, (record_id, record) in enumerate(read_records(self.args.input)):
+                if self.args.limit and count >= self.args.limit:
+                    break
+                if record_id in done or record_id in seen:
+                    # 已成功的记录，或输入中 ID 重复的记录
+                    self.counts["skipped"] += 1
+                    continue
+                seen.add(record_id)
+                if isinstance(record, str):
+                    emit({"id": record_id, "status": STATUS_ERROR, "result": None, "error": record,
+                          "cached": False, "seconds": 0.0, "evaluated_at": time.time()})
+                    continue
+                try:
+                    image = self._load_image(record)
+                except OSError as e:
+                    emit({"id": record_id, "status": STATUS_ERROR, "result": None, "error": f"无法读取图片: {e}",
+                          "cached": False, "seconds": 0.0, "evaluated_at": time.time()})
+                    continue
+
+                key = self._dedupe_key(record, image)
+                future = pending.get(key)
+                if future is not None:
+                    self.counts["deduplicated"] += 1
+                else:
+                    while len(waiting) >= limit:
+                        collect(block=True)
+                    future = pending[key] = executor.submit(self._evaluate, record, image)
+                    waiting[future] = []
+                waiting[future].append(record_id)
+                if waiting:
+                    collect(block=False)
+
+            while waiting:
+                collect(block=True)
+
+
+def main():
+    """
+    命令行入口：python -m tools.batch_evaluate --input records.jsonl --output results.jsonl --concurrency 4
+    需在项目根目录运行（读取 assets 下的配置）；结果文件已存在时从断点继续，--restart 时重新开始
+    """
+    parser = argparse.ArgumentParser(description="批量研究进度评估（JSONL 输入，JSONL / Parquet 输出）")
+    parser.add_argument("--input", required=True, help="输入 JSONL，每行一条 {user_text, image_path} 记录")
+    parser.add_argument("--output", required=True, help="结果 JSONL（逐条追加写入，同时作为断点）")
+    parser.add_argument("--parquet", default=None, help="同时将结果写入 Parquet 文件（需要 pyarrow）")
+    parser.add_argument("--parquet-batch", type=int, default=100, help="Parquet 每个 row group 的行数")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时进行的评估数")
+    parser.add_argument("--tier", choices=_TIERS, default=None,
+                        help="思考档位，缺省时按输入自动选择，结果不可用时自动升级；"
+                             "指定档位（或记录中的 tier，优先）时不升级")
+    parser.add_argument("--stage", default=None, help="阶段名称，缺省时自动判断（记录中的 stage 优先）")
+    parser.add_argument("--limit", type=int, default=0, help="最多处理的记录数（0 为不限）")
+    parser.add_argument("--no-cache", action="store_true", help="不读取评估结果缓存（结果仍会写入缓存）")
+    parser.add_argument("--restart", action="store_true", help="忽略已有结果，清空输出文件后重新评估")
+    parser.add_argument("--mock", action="store_true", help="在进程内启动模拟 LLM 服务（用于试运行）")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    if args.mock:
+        server = MockLLMServer(settings=settings_from_args(args)).start()
+        os.environ["QWEN_BASE_URL"] = server.base_url
+        os.environ.setdefault("QWEN_API_KEY", "mock-key")
+        print(f"模拟 LLM 服务: {server.base_url}")
+
+    # 评估器在导入时读取 API 密钥，需在设置环境变量之后导入；modules 包从当前目录导入
+    sys.path.insert(0, os.getcwd())
+    from modules.research_evaluator import research_evaluator
+
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    done = load_checkpoint(args.output)
+    if done:
+        print(f"从断点继续：跳过 {len(done)} 条已成功的记录")
+
+    batch = BatchEvaluator(research_evaluator, args)
+    parquet = ParquetSink(args.parquet, args.parquet_batch) if args.parquet else None
+    started = time.perf_counter()
+    try:
+        with open(args.output, "a", encoding="utf-8") as output:
+            batch.run(done, output, parquet)
+    except KeyboardInterrupt:
+        print("\n已中断，已完成的结果保存在输出文件中，重新运行即可从断点继续")
+    finally:
+        if parquet is not None:
+            parquet.close()
+        if server is not None:
+            server.stop()
+    elapsed = time.perf_counter() - started
+
+    counts = batch.counts
+    evaluated = counts["ok"] + counts["error"]
+    print(f"\n总耗时 {elapsed:.1f}s，完成 {evaluated} 条（成功 {counts['ok']}，失败 {counts['error']}），"
+          f"跳过 {counts['skipped']} 条，批内去重 {counts['deduplicated']} 条，命中缓存 {counts['cached']} 条，"
+          f"吞吐量 {evaluated / elapsed if elapsed else 0.0:.2f} 条/秒")
+    print(f"结果已写入 {args.output}" + (f" 和 {args.parquet}" if args.parquet else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+# 流式清单索引的回归检查：把一组文档分别用 json.loads 和 StreamingChecklistIndex 读取，
+# 在不同的读取块大小下比较两者得到的清单、字节偏移与文件哈希。任一文档不一致时以非零状态退出
+
+_ITEMS = [{"id": 1, "description": "明确研究问题和目标", "weight": 0.3},
+          {"id": 2, "description": "收集相关文献支持", "weight": 0.7}]
+_CHECKLISTS = [{"id": 1, "stage_id": 1, "topic_id": 1, "name": "课题更改准备清单", "items": _ITEMS},
+               {"id": 2, "stage_id": 2, "topic_id": 3, "name": "开题清单", "items": _ITEMS[:1]}]
+
+# (名称, 文档文本)；键名 "checklists" 出现在其他键的值中时不能被误认为顶层键
+DOCUMENTS: List[Tuple[str, str]] = [
+    ("plain", json.dumps({"checklists": _CHECKLISTS}, ensure_ascii=False, indent=2)),
+    ("title_value", json.dumps({"title": "checklists", "checklists": _CHECKLISTS}, ensure_ascii=False)),
+    ("nested_key", json.dumps({"meta": {"checklists": 2}, "checklists": _CHECKLISTS}, ensure_ascii=False)),
+    ("other_values", json.dumps({"version": 12345, "tags": ["checklists", {"x": [1, 2]}], "note": "\"checklists\": [",
+                                 "checklists": _CHECKLISTS, "after": {"checklists": []}}, ensure_ascii=False)),
+    ("empty_array", json.dumps({"checklists": []})),
+    ("missing_key", json.dumps({"meta": {"checklists": _CHECKLISTS}})),
+    ("empty_object", " { } "),
+]
+# 读取块大小（字节）；小块用于覆盖键名、数字和元素跨块截断的情况
+_CHUNK_SIZES = (1, 7, 64, 1024 * 1024)
+
+
+def _expected(text: str) -> List[Dict[str, Any]]:
+    """内存模式（json.loads）读到的清单"""
+    return json.loads(text).get("checklists", [])
+
+
+def check_document(text: str, chunk_size: int):
+    """比较流式解析与 json.loads 的结果，并检查记录的字节偏移可以直接解码出对应清单"""
+    from modules import checklist_stream
+
+    data = text.encode("utf-8")
+    fd, path = tempfile.mkstemp(suffix=".json")
+    original_chunk_size = checklist_stream._CHUNK_SIZE
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        checklist_stream._CHUNK_SIZE = chunk_size
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            elements = list(checklist_stream._iter_array_elements(f, "checklists", hasher))
+        assert [raw for _, _, raw in elements] == _expected(text), "解析出的清单与 json.loads 不一致"
+        for offset, length, raw in elements:
+            assert json.loads(data[offset:offset + length].decode("utf-8")) == raw, f"偏移 {offset} 处的内容不一致"
+        assert hasher.hexdigest() == hashlib.sha256(data).hexdigest(), "文件哈希不一致"
+    finally:
+        checklist_stream._CHUNK_SIZE = original_chunk_size
+        os.remove(path)
+
+
+def run_checks(names: List[str] = None) -> int:
+    """
+    执行检查
+
+    Returns:
+        int: 失败的文档数
+    """
+    failures = 0
+    for name, text in DOCUMENTS:
+        if names and name not in names:
+            continue
+        try:
+            for chunk_size in _CHUNK_SIZES:
+                check_document(text, chunk_size)
+        except Exception as e:
+            failures += 1
+            print(f"✗ {name}（块大小 {chunk_size}）: {type(e).__name__}: {e}")
+        else:
+            print(f"✓ {name}")
+    return failures
+
+
+def main():
+    """命令行入口：python -m tools.checklist_stream_check [--only title_value nested_key]"""
+    parser = argparse.ArgumentParser(description="流式清单索引回归检查")
+    parser.add_argument("--only", nargs="*", choices=[name for name, _ in DOCUMENTS], help="只检查指定的文档")
+    args = parser.parse_args()
+    failures = run_checks(args.only)
+    print(f"\n{len(args.only or DOCUMENTS) - failures} 项通过，{failures} 项失败")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from tools.mock_llm_server import MockLLMServer, add_settings_arguments, settings_from_args
+
+# 端到端压测：用 Streamlit AppTest 在同一进程内模拟 N 个并发会话，
+# 依次执行 打开页面 → 选择阶段 → 选择课题 → 勾选清单 → 发送聊天消息 →（可选）研究进度评估，
+# 统计各页面操作的吞吐量和 p50/p95/p99 延迟
+
+_EVALUATION_LABEL = "描述您的研究进度和遇到的问题："
+_EVALUATION_BUTTON = "🔍 智能评估研究进度"
+# 轮询后台评估任务的间隔（秒）
+_POLL_INTERVAL = 0.2
+# _shared_app_test_runtime 替换的 Runtime 私有接口（在 Streamlit 1.65 上验证）
+_RUNTIME_CLASSMETHODS = ("instance", "exists")
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """最近秩法计算百分位数"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+class Recorder:
+    """线程安全地记录每个页面操作的耗时和错误"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.messages: List[str] = []
+
+    def record(self, action: str, seconds: float, error: Optional[str] = None):
+        with self._lock:
+            self.timings.setdefault(action, []).append(seconds)
+            if error:
+                self.errors[action] = self.errors.get(action, 0) + 1
+                if len(self.messages) < 20:
+                    self.messages.append(f"{action}: {error}")
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        """汇总为 {操作: 统计}，延迟单位为毫秒"""
+        actions = {}
+        total = 0
+        for action, samples in self.timings.items():
+            total += len(samples)
+            actions[action] = {
+                "count": len(samples),
+                "errors": self.errors.get(action, 0),
+                "throughput": len(samples) / elapsed if elapsed else 0.0,
+                "mean_ms": sum(samples) / len(samples) * 1000,
+                "p50_ms": percentile(samples, 0.50) * 1000,
+                "p95_ms": percentile(samples, 0.95) * 1000,
+                "p99_ms": percentile(samples, 0.99) * 1000,
+            }
+        return {"elapsed_s": elapsed, "actions_total": total,
+                "throughput": total / elapsed if elapsed else 0.0,
+                "actions": actions, "error_samples": self.messages}
+
+
+def _page_error(at) -> Optional[str]:
+    """读取脚本异常或页面上的 st.error 文本"""
+    if len(at.exception):
+        return str(at.exception[0].value)[:200]
+    if len(at.error):
+        return str(at.error[0].value)[:200]
+    return None
+
+
+def _widget(widgets, predicate: Callable[[Any], bool]):
+    """按条件查找控件"""
+    for widget in widgets:
+        if predicate(widget):
+            return widget
+    return None
+
+
+@contextlib.contextmanager
+def _shared_app_test_runtime():
+    """
+    AppTest 每次运行时设置全局 Runtime 实例、结束时清空；多个会话并发运行时会清掉彼此的实例。
+    在 with 块内让实例被清空后的读取回退到最近一次设置的实例（压测进程内所有会话共享），退出时恢复原实现。
+    依赖 Streamlit 的私有接口，接口不存在时直接报错退出
+    """
+    import streamlit
+    from streamlit.runtime import Runtime
+
+    attributes = vars(Runtime)
+    missing = [name for name in _RUNTIME_CLASSMETHODS if not isinstance(attributes.get(name), classmethod)]
+    if "_instance" not in attributes:
+        missing.append("_instance")
+    if missing:
+        raise SystemExit(f"当前 Streamlit {streamlit.__version__} 的 Runtime 缺少 {', '.join(missing)}，"
+                         f"无法并发运行 AppTest 会话（需要调整 tools/load_test.py 中的 _shared_app_test_runtime）")
+
+    last = {}
+
+    def current(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+        return cls._instance or last.get("runtime")
+
+    def instance(cls):
+        runtime = current(cls)
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return runtime
+
+    originals = {name: attributes[name] for name in _RUNTIME_CLASSMETHODS}
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: current(cls) is not None)
+    try:
+        yield
+    finally:
+        for name, original in originals.items():
+            setattr(Runtime, name, original)
+
+
+def run_session(index: int, args: argparse.Namespace, recorder: Recorder):
+    """
+    执行一个模拟会话
+
+    Args:
+        index (int): 会话序号
+        args: 命令行参数
+        recorder (Recorder): 结果记录器
+    """
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(args.app, default_timeout=args.timeout)
+
+    def step(action: str, perform: Callable[[], Any]) -> bool:
+        started = time.perf_counter()
+        try:
+            perform()
+            error = _page_error(at)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        recorder.record(action, time.perf_counter() - started, error)
+        return error is None
+
+    if not step("load", at.run):
+        return
+
+    # 选择阶段（按会话序号轮流选择）
+    stage_buttons = [button for button in at.button if str(button.key or "").startswith("stage_")]
+    if not stage_buttons:
+        recorder.record("select_stage", 0.0, "页面上没有阶段按钮")
+        return
+    stage_button = stage_buttons[index % len(stage_buttons)]
+    stage_id = str(stage_button.key)[len("stage_"):]
+    if not step("select_stage", lambda: stage_button.click().run()):
+        return
+
+    topic_buttons = [button for button in at.button if str(button.key or "").startswith("topic_")]
+    if not topic_buttons:
+        recorder.record("select_topic", 0.0, "页面上没有课题按钮")
+        return
+    topic_button = topic_buttons[index % len(topic_buttons)]
+    if not step("select_topic", lambda: topic_button.click().run()):
+        return
+
+    for iteration in range(args.iterations):
+        checkboxes = [box for box in at.checkbox if str(box.key or "").startswith("check_")]
+        if not checkboxes:
+            recorder.record("toggle_checklist", 0.0, "页面上没有任务清单")
+        else:
+            checkbox = checkboxes[(index + iteration) % len(checkboxes)]
+            step("toggle_checklist", lambda: checkbox.set_value(not checkbox.value).run())
+
+        if args.repeat_prompts:
+            message = "如何确定合适的研究方向？"
+        else:
+            message = f"[会话{index}-{iteration}] 如何确定合适的研究方向？"
+        chat_input = _widget(at.text_area, lambda widget: widget.key == f"chat_input_{stage_id}")
+        send_button = _widget(at.button, lambda widget: widget.key == f"send_btn_{stage_id}")
+        if chat_input is None or send_button is None:
+            recorder.record("chat", 0.0, "页面上没有聊天输入框")
+        else:
+            chat_input.input(message)
+            step("chat", lambda: send_button.click().run())
+
+        if args.think_time:
+            time.sleep(args.think_time)
+
+    if args.evaluate:
+        evaluate_button = _widget(at.button, lambda widget: widget.key == f"research_eval_{stage_id}")
+        if evaluate_button is None or not step("open_evaluation", lambda: evaluate_button.click().run()):
+            return
+        text_area = _widget(at.text_area, lambda widget: widget.label == _EVALUATION_LABEL)
+        button = _widget(at.button, lambda widget: widget.label == _EVALUATION_BUTTON)
+        if text_area is None or button is None:
+            recorder.record("evaluate", 0.0, "页面上没有评估输入框")
+            return
+        text_area.input(f"[会话{index}] 已完成文献阅读和实验方案初步设计，模拟实验尚未完成。")
+
+        def evaluate():
+            # 评估在后台任务中执行，重新运行页面轮询到任务结束（相当于页面的自动刷新）
+            button.click().run()
+            deadline = time.monotonic() + args.timeout
+            while at.session_state["evaluation_job"] is not None:
+                if time.monotonic() > deadline:
+                    raise TimeoutError("评估任务超时")
+                time.sleep(_POLL_INTERVAL)
+                at.run()
+
+        step("evaluate", evaluate)
+
+
+def print_report(summary: Dict[str, Any]):
+    """以表格形式输出结果"""
+    print(f"\n总耗时 {summary['elapsed_s']:.1f}s，共 {summary['actions_total']} 次操作，"
+          f"吞吐量 {summary['throughput']:.2f} 次/秒")
+    header = f"{'操作':<18}{'次数':>6}{'错误':>6}{'次/秒':>8}{'均值ms':>10}{'p50ms':>10}{'p95ms':>10}{'p99ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for action, stats in summary["actions"].items():
+        print(f"{action:<18}{stats['count']:>6}{stats['errors']:>6}{stats['throughput']:>8.2f}"
+              f"{stats['mean_ms']:>10.0f}{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}{stats['p99_ms']:>10.0f}")
+    if "mock_server" in summary:
+        print(f"\n模拟服务统计: {summary['mock_server']}")
+    if summary["error_samples"]:
+        print("\n错误示例：")
+        for message in summary["error_samples"]:
+            print(f"  {message}")
+
+
+def main():
+    """
+    命令行入口：python -m tools.load_test --sessions 20 --iterations 3
+    默认在进程内启动模拟 LLM 服务；--no-mock 时使用环境变量 DEEPSEEK_API_URL / QWEN_BASE_URL 指向的服务
+    """
+    parser = argparse.ArgumentParser(description="端到端压测（Streamlit AppTest + 模拟 LLM 服务）")
+    parser.add_argument("--sessions", type=int, default=10, help="并发会话数")
+    parser.add_argument("--iterations", type=int, default=3, help="每个会话发送的聊天消息数")
+    parser.add_argument("--evaluate", action="store_true", help="每个会话最后执行一次研究进度评估")
+    parser.add_argument("--think-time", type=float, default=0.0, help="两次聊天之间的停顿（秒）")
+    parser.add_argument("--repeat-prompts", action="store_true",
+                        help="所有会话发送相同的消息（用于观察响应缓存的效果）")
+    parser.add_argument("--timeout", type=float, default=120.0, help="单次页面运行的超时（秒）")
+    parser.add_argument("--app", default="app.py", help="Streamlit 入口脚本")
+    parser.add_argument("--no-mock", action="store_true", help="不启动进程内模拟服务")
+    parser.add_argument("--json", dest="json_path", default=None, help="将结果写入 JSON 文件")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    if not args.no_mock:
+        server = MockLLMServer(settings=settings_from_args(args)).start()
+        os.environ["DEEPSEEK_API_URL"] = f"{server.base_url}/chat/completions"
+        os.environ["QWEN_BASE_URL"] = server.base_url
+        os.environ.setdefault("DEEPSEEK_API_KEY", "mock-key")
+        os.environ.setdefault("QWEN_API_KEY", "mock-key")
+        print(f"模拟 LLM 服务: {server.base_url}")
+
+    # AppTest 按调用方文件解析相对路径，这里统一转为绝对路径；modules 包从脚本所在目录导入
+    args.app = os.path.abspath(args.app)
+    sys.path.insert(0, os.path.dirname(args.app))
+
+    recorder = Recorder()
+    started = time.perf_counter()
+    with _shared_app_test_runtime(), ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        futures = [executor.submit(run_session, index, args, recorder) for index in range(args.sessions)]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    summary = recorder.summary(elapsed)
+    if server is not None:
+        summary["mock_server"] = dict(server.stats)
+        server.stop()
+    print_report(summary)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
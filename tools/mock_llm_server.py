@@ -0,0 +1,282 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# OpenAI 兼容的本地模拟服务：支持流式输出、可配置的延迟分布和错误率，
+# 用于在不调用 DeepSeek/千问的情况下压测应用
+
+# 评估请求返回的示例结果（结构与评估提示词要求的一致）
+_EVALUATION_RESULT = {
+    "current_stage": "开题阶段",
+    "tasks_progress": {
+        "选题阶段（Topic Selection）": 0.8,
+        "立题与问题定义（Problem Definition）": 0.6,
+        "研究方案设计（Method Design）": 0.4,
+        "可行性与时间规划（Feasibility & Schedule）": 0.2
+    },
+    "advice": "先完成研究方案中的关键变量和评估指标设计，再与导师确认时间规划。",
+    "mentor_insights": "导师关注方案的可行性，建议下次汇报时带上初步实验计划。"
+}
+
+# 请求开启思考（enable_thinking）时，流式输出正文前先输出的思考内容
+_THINKING = ("先根据描述判断所处阶段：已完成文献阅读和方案设计，实验尚未开始，属于开题阶段。"
+             "再对照开题阶段的各项子任务逐一估计完成度，最后结合导师意见给出建议。")
+
+_CHAT_REPLY = ("这是模拟服务返回的回答。建议先明确研究问题，再围绕问题梳理相关文献，"
+               "整理出现有方法的不足之处，并据此制定下一步的实验计划。")
+
+
+class MockSettings(NamedTuple):
+    """模拟服务的行为配置"""
+    latency_median: float = 0.5   # 首字延迟（对数正态分布）的中位数（秒）
+    latency_sigma: float = 0.5    # 对数正态分布的 sigma，越大长尾越明显
+    token_interval: float = 0.02  # 流式输出时相邻两段内容的间隔（秒）
+    chunk_chars: int = 8          # 流式输出每段的字符数
+    error_rate: float = 0.0       # 返回 500 的概率
+    throttle_rate: float = 0.0    # 返回 429 的概率
+    retry_after: float = 1.0      # 429 响应中的 Retry-After（秒）
+    reply_chars: int = 0          # 聊天回答的长度，0 表示使用默认文本
+
+
+def _estimate_tokens(text: str) -> int:
+    """粗略估算 token 数，只用于填充 usage"""
+    return max(1, len(text) // 2)
+
+
+def _message_text(messages: List[Dict[str, Any]]) -> str:
+    """拼接消息中的全部文本"""
+    parts = []
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(part.get("text", "") for part in content or () if isinstance(part, dict))
+    return "\n".join(parts)
+
+
+class MockLLMServer:
+    """
+    OpenAI 兼容的模拟服务
+    任意以 /chat/completions 结尾的路径都按聊天补全处理，
+    系统提示要求输出 current_stage 时返回评估 JSON，否则返回聊天文本
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, settings: MockSettings = MockSettings()):
+        self.settings = settings
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "streams": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        """OpenAI 兼容客户端使用的基础地址"""
+        return f"http://{self._server.server_address[0]}:{self.port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """在后台线程中启动"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _latency(self) -> float:
+        """按对数正态分布抽取首字延迟"""
+        if self.settings.latency_median <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.settings.latency_median), self.settings.latency_sigma)
+
+    def _reply(self, body: Dict[str, Any]) -> str:
+        """根据请求内容生成回答"""
+        messages = body.get("messages", [])
+        system = _message_text([m for m in messages if m.get("role") == "system"])
+        if "current_stage" in system:
+            return json.dumps(_EVALUATION_RESULT, ensure_ascii=False)
+        if self.settings.reply_chars > 0:
+            repeats = self.settings.reply_chars // len(_CHAT_REPLY) + 1
+            return (_CHAT_REPLY * repeats)[:self.settings.reply_chars]
+        return _CHAT_REPLY
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/health"):
+                    self._send_json(200, {"status": "ok", **server.stats})
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": {"message": "invalid json"}})
+                    return
+                server._count("requests")
+
+                settings = server.settings
+                roll = random.random()
+                if roll < settings.throttle_rate:
+                    server._count("throttled")
+                    self._send_json(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                                    {"Retry-After": f"{settings.retry_after:g}"})
+                    return
+                if roll < settings.throttle_rate + settings.error_rate:
+                    server._count("errors")
+                    time.sleep(server._latency() / 2)
+                    self._send_json(500, {"error": {"message": "mock internal error"}})
+                    return
+
+                time.sleep(server._latency())
+                reply = server._reply(body)
+                usage = {
+                    "prompt_tokens": _estimate_tokens(_message_text(body.get("messages", []))),
+                    "completion_tokens": _estimate_tokens(reply),
+                }
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+                if body.get("stream"):
+                    server._count("streams")
+                    self._stream(body, reply, usage)
+                else:
+                    self._send_json(200, {
+                        "id": f"chatcmpl-{uuid.uuid4().hex}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body.get("model", "mock"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": reply}}],
+                        "usage": usage,
+                    })
+
+            def _stream(self, body: Dict[str, Any], reply: str, usage: Dict[str, int]):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+                model = body.get("model", "mock")
+
+                def send(choices, extra=None):
+                    payload = {"id": chunk_id, "object": "chat.completion.chunk",
+                               "created": int(time.time()), "model": model, "choices": choices}
+                    payload.update(extra or {})
+                    self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+                size = max(1, server.settings.chunk_chars)
+                try:
+                    if body.get("enable_thinking"):
+                        for start in range(0, len(_THINKING), size):
+                            send([{"index": 0, "delta": {"reasoning_content": _THINKING[start:start + size]},
+                                   "finish_reason": None}])
+                            time.sleep(server.settings.token_interval)
+                    for start in range(0, len(reply), size):
+                        if start:
+                            time.sleep(server.settings.token_interval)
+                        send([{"index": 0, "delta": {"content": reply[start:start + size]},
+                               "finish_reason": None}])
+                    send([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+                    if (body.get("stream_options") or {}).get("include_usage"):
+                        send([], {"usage": usage})
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端提前断开
+                    pass
+
+        return Handler
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser):
+    """添加模拟服务的命令行参数（load_test 复用）"""
+    defaults = MockSettings()
+    parser.add_argument("--latency-median", type=float, default=defaults.latency_median,
+                        help="首字延迟中位数（秒）")
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma,
+                        help="首字延迟对数正态分布的 sigma")
+    parser.add_argument("--token-interval", type=float, default=defaults.token_interval,
+                        help="流式输出相邻两段的间隔（秒）")
+    parser.add_argument("--chunk-chars", type=int, default=defaults.chunk_chars,
+                        help="流式输出每段的字符数")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="返回 500 的概率")
+    parser.add_argument("--throttle-rate", type=float, default=defaults.throttle_rate, help="返回 429 的概率")
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after,
+                        help="429 响应的 Retry-After（秒）")
+    parser.add_argument("--reply-chars", type=int, default=defaults.reply_chars,
+                        help="聊天回答长度，0 表示默认文本")
+
+
+def settings_from_args(args: argparse.Namespace) -> MockSettings:
+    """根据命令行参数构建配置"""
+    return MockSettings(**{field: getattr(args, field) for field in MockSettings._fields})
+
+
+def main():
+    """
+    命令行入口：python -m tools.mock_llm_server [--port 8900] [--latency-median 0.8] [--error-rate 0.02]
+    应用通过环境变量指向该服务：
+        DEEPSEEK_API_URL=http://127.0.0.1:8900/v1/chat/completions
+        QWEN_BASE_URL=http://127.0.0.1:8900/v1
+    """
+    parser = argparse.ArgumentParser(description="本地模拟 LLM 服务（OpenAI 兼容接口）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.host, args.port, settings_from_args(args))
+    print(f"模拟 LLM 服务已启动: {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
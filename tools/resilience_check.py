@@ -0,0 +1,245 @@
+import argparse
+import email.utils
+import sys
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from tools.mock_llm_server import MockLLMServer, MockSettings
+
+# 容错策略的自动检查：在进程内启动注入故障的模拟服务，经 llm_runtime 发起真实请求，验证
+# Retry-After 退避、熔断器的 打开 → 半开 → 关闭 状态转换，以及超过 p95 耗时后的对冲请求（含限流配额与取消）。
+# 任一检查失败时以非零状态退出
+
+_MESSAGES = [{"role": "user", "content": "你好"}]
+# 正常响应的固定延迟（秒）
+_FAST = 0.05
+
+
+class _FakeError(Exception):
+    """带响应头的异常，用于检查 Retry-After 解析"""
+
+    def __init__(self, headers):
+        super().__init__("fake")
+        self.response = type("Response", (), {"headers": headers})()
+
+
+def _server(**settings) -> MockLLMServer:
+    """启动固定延迟（sigma=0）的模拟服务"""
+    return MockLLMServer(settings=MockSettings(latency_median=_FAST, latency_sigma=0, **settings)).start()
+
+
+def _config(server: MockLLMServer, **policy):
+    """指向模拟服务的连接配置（每个服务端口独立熔断）"""
+    from modules.llm_runtime import ProviderConfig
+    from modules.resilience import ResiliencePolicy
+
+    return ProviderConfig("mock-key", server.base_url, read_timeout=10,
+                          resilience=ResiliencePolicy(**policy))
+
+
+def _complete(config, name: str = "resilience-check"):
+    from modules.llm_runtime import llm_runtime
+
+    return llm_runtime.complete(name, config, model="mock", messages=_MESSAGES)
+
+
+def _expect_error(config, error_type: type) -> BaseException:
+    try:
+        _complete(config)
+    except error_type as e:
+        return e
+    raise AssertionError(f"应抛出 {error_type.__name__}")
+
+
+def check_retry_after_parsing():
+    """Retry-After：秒数、retry-after-ms、HTTP 日期可以解析，格式错误时返回 None（按普通退避处理）"""
+    from modules.resilience import retry_after_seconds
+
+    assert retry_after_seconds(_FakeError({"retry-after": "2"})) == 2.0
+    assert retry_after_seconds(_FakeError({"retry-after-ms": "1500"})) == 1.5
+    date = email.utils.formatdate(time.time() + 10, usegmt=True)
+    assert 8 <= retry_after_seconds(_FakeError({"retry-after": date})) <= 10
+    for value in ("soon", "Mon, 99 Foo 2026 99:99:99 GMT", "Wed, 32 Oct"):
+        assert retry_after_seconds(_FakeError({"retry-after": value})) is None, value
+
+
+def check_retry_after_backoff():
+    """429 + Retry-After：按服务端要求的间隔重试，并以 max_retry_after 为上限"""
+    server = _server(throttle_rate=1.0, retry_after=0.3)
+    try:
+        # base_delay=0 时普通退避为 0，耗时只能来自 Retry-After
+        config = _config(server, max_attempts=3, base_delay=0, failure_threshold=100)
+        started = time.monotonic()
+        _expect_error(config, Exception)
+        elapsed = time.monotonic() - started
+        assert server.stats["throttled"] == 3, server.stats
+        assert 0.6 <= elapsed < 2.0, f"两次重试应各等待 0.3s，实际共 {elapsed:.2f}s"
+
+        server.settings = server.settings._replace(retry_after=30)
+        config = _config(server, max_attempts=2, base_delay=0, max_retry_after=0.2, failure_threshold=100)
+        started = time.monotonic()
+        _expect_error(config, Exception)
+        elapsed = time.monotonic() - started
+        assert elapsed < 1.5, f"Retry-After 应被限制为 0.2s，实际等待 {elapsed:.2f}s"
+    finally:
+        server.stop()
+
+
+def check_circuit_breaker():
+    """熔断器：连续失败后打开并直接拒绝 → 超时后半开只放行一个探测 → 探测失败重新打开 → 探测成功关闭"""
+    from modules.llm_runtime import llm_runtime
+    from modules.resilience import CircuitBreaker, CircuitOpenError, ResiliencePolicy
+
+    server = _server(error_rate=1.0)
+    try:
+        config = _config(server, max_attempts=1, failure_threshold=2, recovery_timeout=0.5)
+        _expect_error(config, Exception)
+        assert not llm_runtime.circuit_open(config), "失败次数未达阈值时不应熔断"
+        _expect_error(config, Exception)
+        assert llm_runtime.circuit_open(config), "连续失败达到阈值后应熔断"
+
+        requests = server.stats["requests"]
+        _expect_error(config, CircuitOpenError)
+        assert server.stats["requests"] == requests, "熔断期间请求不应到达服务端"
+
+        # 半开：探测请求失败后重新打开
+        time.sleep(0.6)
+        _expect_error(config, Exception)
+        assert server.stats["requests"] == requests + 1, "半开状态应放行一个探测请求"
+        _expect_error(config, CircuitOpenError)
+
+        # 半开：探测请求成功后关闭
+        time.sleep(0.6)
+        server.settings = server.settings._replace(error_rate=0.0)
+        _complete(config)
+        assert not llm_runtime.circuit_open(config), "探测成功后应关闭熔断"
+        _complete(config)
+    finally:
+        server.stop()
+
+    # 半开状态下并发的第二个请求被拒绝
+    policy = ResiliencePolicy(failure_threshold=1, recovery_timeout=0.05)
+    breaker = CircuitBreaker("check")
+    breaker.record_failure(policy)
+    time.sleep(0.1)
+    breaker.before_call(policy)
+    try:
+        breaker.before_call(policy)
+    except CircuitOpenError:
+        pass
+    else:
+        raise AssertionError("半开状态只应放行一个探测请求")
+    breaker.record_success()
+    breaker.before_call(policy)
+
+
+def check_hedging():
+    """对冲请求：积累足够的耗时样本后，超过 p95 仍未返回的请求会并行发起第二个请求，取先返回者"""
+    server = _server()
+    try:
+        config = _config(server, hedge=True, hedge_min_delay=0.2, hedge_min_samples=5)
+        for _ in range(5):
+            _complete(config)
+        requests = server.stats["requests"]
+
+        # 主请求很慢；对冲请求发出时服务已恢复正常
+        server.settings = server.settings._replace(latency_median=3.0)
+        timer = threading.Timer(0.1, lambda: setattr(
+            server, "settings", server.settings._replace(latency_median=_FAST)))
+        timer.start()
+        started = time.monotonic()
+        _complete(config)
+        elapsed = time.monotonic() - started
+        timer.join()
+        assert server.stats["requests"] == requests + 2, f"应发起一个对冲请求: {server.stats}"
+        assert elapsed < 1.5, f"应采用先返回的对冲结果，实际耗时 {elapsed:.2f}s"
+
+        # 限流配额不足时不对冲：主请求取走本分钟唯一的请求令牌
+        from modules.rate_limiter import RateLimitSettings
+        limited = config._replace(rate_limit=RateLimitSettings(enabled=True, requests_per_minute=1))
+        server.settings = server.settings._replace(latency_median=0.5)
+        requests = server.stats["requests"]
+        _complete(limited)
+        assert server.stats["requests"] == requests + 1, f"配额不足时不应发起对冲请求: {server.stats}"
+        server.settings = server.settings._replace(latency_median=_FAST)
+
+        # 样本不足时不对冲
+        fresh = _server()
+        try:
+            fresh_config = _config(fresh, hedge=True, hedge_min_delay=0.2, hedge_min_samples=5)
+            fresh.settings = fresh.settings._replace(latency_median=0.5)
+            _complete(fresh_config)
+            assert fresh.stats["requests"] == 1, "样本不足时不应对冲"
+        finally:
+            fresh.stop()
+    finally:
+        server.stop()
+
+
+def check_hedge_cancellation():
+    """对冲等待期间调用方被取消时，原请求同时被取消"""
+    import asyncio
+    from modules.resilience import LatencyWindow, _hedged
+
+    async def scenario():
+        cancelled = asyncio.Event()
+
+        async def call():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.ensure_future(_hedged(call, LatencyWindow(), 5.0))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1.0)
+
+    asyncio.run(scenario())
+
+
+CHECKS: List[Tuple[str, Callable[[], None]]] = [
+    ("retry_after_parsing", check_retry_after_parsing),
+    ("retry_after_backoff", check_retry_after_backoff),
+    ("circuit_breaker", check_circuit_breaker),
+    ("hedging", check_hedging),
+    ("hedge_cancellation", check_hedge_cancellation),
+]
+
+
+def run_checks(names: Optional[List[str]] = None) -> int:
+    """
+    执行检查
+
+    Returns:
+        int: 失败的检查数
+    """
+    failures = 0
+    for name, check in CHECKS:
+        if names and name not in names:
+            continue
+        started = time.perf_counter()
+        try:
+            check()
+        except Exception as e:
+            failures += 1
+            print(f"✗ {name}（{time.perf_counter() - started:.1f}s）: {type(e).__name__}: {e}")
+        else:
+            print(f"✓ {name}（{time.perf_counter() - started:.1f}s）")
+    return failures
+
+
+def main():
+    """命令行入口：python -m tools.resilience_check [--only circuit_breaker hedging]"""
+    parser = argparse.ArgumentParser(description="容错策略检查（重试、熔断、对冲请求）")
+    parser.add_argument("--only", nargs="*", choices=[name for name, _ in CHECKS], help="只执行指定的检查")
+    args = parser.parse_args()
+    failures = run_checks(args.only)
+    print(f"\n{len(args.only or CHECKS) - failures} 项通过，{failures} 项失败")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()